@@ -9,19 +9,18 @@ ao longo da cadeia até que um objeto a trate.
 
 # Implementando com funcoes
 
+ABC_LETTERS = frozenset(['A', 'B', 'C'])
+DEF_LETTERS = frozenset(['D', 'E', 'F'])
 
-def handler_ABC(letter: str) -> str:
-    letters = ['A', 'B', 'C']
 
-    if letter in letters:
+def handler_ABC(letter: str) -> str:
+    if letter in ABC_LETTERS:
         return f'handler_ABC: conseguiu tratar o valor {letter}'
     return handler_DEF(letter)
 
 
 def handler_DEF(letter: str) -> str:
-    letters = ['D', 'E', 'F']
-
-    if letter in letters:
+    if letter in DEF_LETTERS:
         return f'handler_DEF: conseguiu tratar o valor {letter}'
     return handler_unsolved(letter)
 
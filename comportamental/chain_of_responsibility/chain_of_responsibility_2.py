@@ -1,17 +1,76 @@
+from __future__ import annotations
 from abc import ABC, abstractmethod
+from typing import Any, Iterable
+
+try:
+    import numpy as np
+except ImportError:  # numpy e opcional, usado apenas no handle_many
+    np = None  # type: ignore[assignment]
 
 
 class Handler(ABC):
+    # letters: conjunto de letras que o handler trata. Handlers sem
+    # letters tratam a letra por conta propria (e chamam o sucessor se
+    # precisarem).
+    letters: frozenset[str] | None = None
+
     def __init__(self) -> None:
         self.sucessor: Handler
 
     @abstractmethod
     def handle(self, letter: str) -> str: pass
 
+    def handle_many(self, letters: Iterable[str]) -> list[str]:
+        # Cada handler separa de uma vez todas as letras que trata e passa
+        # apenas o restante para o sucessor. Com um array NumPy, a
+        # separacao e uma unica mascara np.isin por handler.
+        pending: Any
+        if np is not None and isinstance(letters, np.ndarray):
+            pending = letters
+            index: Any = np.arange(len(letters))
+        else:
+            pending = list(letters)
+            index = range(len(pending))
+
+        results: list[str] = [''] * len(pending)
+        handler: Handler | None = self
+
+        while handler is not None and len(pending):
+            if handler.letters is None:
+                # Nao enumeravel: o proprio handle percorre o resto
+                for i, letter in zip(index, pending):
+                    results[i] = handler.handle(letter)
+                return results
+
+            if np is not None and isinstance(pending, np.ndarray):
+                mask = np.isin(pending, list(handler.letters))
+                claimed = list(zip(index[mask], pending[mask]))
+                index, pending = index[~mask], pending[~mask]
+            else:
+                claimed, rest_index, rest = [], [], []
+                for i, letter in zip(index, pending):
+                    if letter in handler.letters:
+                        claimed.append((i, letter))
+                    else:
+                        rest_index.append(i)
+                        rest.append(letter)
+                index, pending = rest_index, rest
+
+            for i, letter in claimed:
+                results[i] = handler.handle(letter)
+
+            handler = getattr(handler, 'sucessor', None)
+
+        if len(pending):
+            raise LookupError(f'Nenhum handler tratou {list(pending)}')
+
+        return results
+
 
 class HandlerABC(Handler):
+    letters = frozenset(['A', 'B', 'C'])
+
     def __init__(self, sucessor: Handler) -> None:
-        self.letters = ['A', 'B', 'C']
         self.sucessor = sucessor
 
     def handle(self, letter: str) -> str:
@@ -21,8 +80,9 @@ class HandlerABC(Handler):
 
 
 class HandlerDEF(Handler):
+    letters = frozenset(['D', 'E', 'F'])
+
     def __init__(self, sucessor: Handler) -> None:
-        self.letters = ['D', 'E', 'F']
         self.sucessor = sucessor
 
     def handle(self, letter: str) -> str:
@@ -50,3 +110,10 @@ if __name__ == '__main__':
     print(handler_abc.handle('G'))
     print(handler_abc.handle('H'))
     print(handler_abc.handle('I'))
+    print()
+
+    print(handler_abc.handle_many('AGDBHE'))
+
+    if np is not None:
+        batch = np.array(list('ABCDEFGHI' * 3))
+        print(handler_abc.handle_many(batch))
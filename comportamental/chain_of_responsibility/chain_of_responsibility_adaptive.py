@@ -0,0 +1,218 @@
+"""
+Cadeia de responsabilidade que se reordena pela frequencia de uso.
+
+Entre cada handler e o seu sucessor fica um _Probe, que conta quantas
+solicitacoes chegaram naquele ponto da cadeia e quanto tempo elas levaram.
+A diferenca entre um probe e o seguinte da os acertos e o tempo proprio de
+cada handler.
+
+A cada `reorder_every` solicitacoes a cadeia e religada (via `sucessor`)
+com os handlers mais usados primeiro. A ordem so muda onde isso nao altera
+o resultado:
+- restricoes declaradas (antes, depois) sao sempre respeitadas;
+- handlers com letras em comum mantem a ordem original entre si;
+- handlers sem `letters` (predicado desconhecido) mantem a ordem original
+  em relacao a todos os outros.
+"""
+from __future__ import annotations
+import heapq
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Iterable
+
+from chain_of_responsibility_2 import (Handler, HandlerABC, HandlerDEF,
+                                       HandlerUnsolved)
+
+
+class _Probe(Handler):
+    def __init__(self, target: Handler) -> None:
+        self.target = target
+        self.calls = 0
+        self.seconds = 0.0
+
+    def handle(self, letter: str) -> str:
+        self.calls += 1
+        start = perf_counter()
+        try:
+            return self.target.handle(letter)
+        finally:
+            self.seconds += perf_counter() - start
+
+
+@dataclass
+class HandlerStats:
+    name: str
+    hits: int
+    seconds: float
+
+
+class AdaptiveChain(Handler):
+    def __init__(
+        self,
+        handlers: list[Handler],
+        terminal: Handler,
+        reorder_every: int = 1_000,
+        constraints: Iterable[tuple[Handler, Handler]] = (),
+    ) -> None:
+        self.reorder_every = reorder_every
+        self.reorders = 0
+        self._order = list(handlers)
+        self._probes = {id(h): _Probe(h) for h in handlers}
+        self._terminal = _Probe(terminal)
+        self._before = self._build_constraints(handlers, constraints)
+        # Acertos acumulados, acertos desde a ultima reordenacao e
+        # pontuacao (com decaimento) usada na ordenacao
+        self._hits = {id(h): 0 for h in handlers}
+        self._window = {id(h): 0 for h in handlers}
+        self._seconds = {id(h): 0.0 for h in handlers}
+        self._score = {id(h): 0.0 for h in handlers}
+        self._pending = 0
+        self._link()
+
+    @staticmethod
+    def _build_constraints(
+        handlers: list[Handler],
+        constraints: Iterable[tuple[Handler, Handler]],
+    ) -> dict[int, set[int]]:
+        # before[b] = handlers que precisam vir antes de b
+        before: dict[int, set[int]] = {id(h): set() for h in handlers}
+
+        for first, second in constraints:
+            for handler in (first, second):
+                if id(handler) not in before:
+                    raise ValueError(
+                        'Restricao com handler fora da cadeia: '
+                        f'{type(handler).__name__}'
+                    )
+            before[id(second)].add(id(first))
+
+        for i, first in enumerate(handlers):
+            for second in handlers[i + 1:]:
+                if (
+                    first.letters is None or second.letters is None
+                    or first.letters & second.letters
+                ):
+                    before[id(second)].add(id(first))
+
+        # Com um ciclo, a ordenacao topologica de reorder() descartaria os
+        # handlers envolvidos sem avisar
+        waiting = {key: set(deps) for key, deps in before.items()}
+        while waiting:
+            free = [key for key, deps in waiting.items() if not deps]
+            if not free:
+                raise ValueError('As restricoes da cadeia formam um ciclo')
+            for key in free:
+                del waiting[key]
+            for deps in waiting.values():
+                deps.difference_update(free)
+
+        return before
+
+    def _link(self) -> None:
+        for handler, following in zip(self._order, self._order[1:]):
+            handler.sucessor = self._probes[id(following)]
+        self._order[-1].sucessor = self._terminal
+
+    def handle(self, letter: str) -> str:
+        result = self._probes[id(self._order[0])].handle(letter)
+        self._pending += 1
+
+        if self._pending >= self.reorder_every:
+            self.reorder()
+
+        return result
+
+    def _collect(self) -> None:
+        # Converte as contagens dos probes em acertos por handler
+        probes = [self._probes[id(h)] for h in self._order] + [self._terminal]
+
+        for handler, probe, following in zip(self._order, probes, probes[1:]):
+            hits = probe.calls - following.calls
+            self._hits[id(handler)] += hits
+            self._seconds[id(handler)] += probe.seconds - following.seconds
+            self._window[id(handler)] += hits
+
+        for probe in probes:
+            probe.calls = 0
+            probe.seconds = 0.0
+
+    def reorder(self) -> None:
+        self._collect()
+        self._pending = 0
+
+        for key, hits in self._window.items():
+            self._score[key] = self._score[key] / 2 + hits
+            self._window[key] = 0
+
+        # Ordenacao topologica: entre os handlers liberados, o de maior
+        # pontuacao primeiro (empate: posicao atual)
+        position = {id(h): i for i, h in enumerate(self._order)}
+        by_id = {id(h): h for h in self._order}
+        waiting = {key: set(value) for key, value in self._before.items()}
+        ready = [
+            (-self._score[key], position[key], key)
+            for key, deps in waiting.items() if not deps
+        ]
+        heapq.heapify(ready)
+        order: list[Handler] = []
+
+        while ready:
+            _, _, key = heapq.heappop(ready)
+            order.append(by_id[key])
+
+            for other, deps in waiting.items():
+                if key in deps:
+                    deps.discard(key)
+                    if not deps:
+                        heapq.heappush(
+                            ready,
+                            (-self._score[other], position[other], other)
+                        )
+
+        if order != self._order:
+            self._order = order
+            self._link()
+            self.reorders += 1
+
+    @property
+    def order(self) -> list[str]:
+        return [type(h).__name__ for h in self._order]
+
+    def stats(self) -> list[HandlerStats]:
+        self._collect()
+        return [
+            HandlerStats(
+                type(h).__name__, self._hits[id(h)], self._seconds[id(h)]
+            )
+            for h in self._order
+        ]
+
+
+class HandlerGHI(HandlerABC):
+    letters = frozenset(['G', 'H', 'I'])
+
+
+if __name__ == '__main__':
+    handler_unsolved = HandlerUnsolved()
+    handler_abc = HandlerABC(handler_unsolved)
+    handler_def = HandlerDEF(handler_unsolved)
+    handler_ghi = HandlerGHI(handler_unsolved)
+
+    chain = AdaptiveChain(
+        [handler_abc, handler_def, handler_ghi],
+        handler_unsolved,
+        reorder_every=100,
+        # HandlerABC sempre antes de HandlerDEF
+        constraints=[(handler_abc, handler_def)],
+    )
+
+    print(chain.order)
+    for _ in range(300):
+        chain.handle('H')
+        chain.handle('A')
+        chain.handle('H')
+
+    print(chain.order, 'reordenacoes:', chain.reorders)
+    for stats in chain.stats():
+        print(stats)
+    print(chain.handle('E'))
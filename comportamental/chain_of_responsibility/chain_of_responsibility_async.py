@@ -0,0 +1,152 @@
+"""
+Cadeia de responsabilidade assincrona, para handlers que fazem I/O
+(banco de dados, HTTP...).
+
+Cada handler separa a decisao (accepts) do tratamento (process):
+- accepts deve ser livre de efeitos colaterais, pois no modo especulativo
+  ele pode ser executado e descartado;
+- process so roda no handler escolhido.
+
+Cada handler pode ter um timeout (um accepts que estoura o timeout conta
+como "nao trato") e um limite de chamadas simultaneas.
+
+No modo especulativo, os accepts dos proximos K handlers rodam ao mesmo
+tempo; o resultado continua sendo o do primeiro handler, na ordem da
+cadeia, que aceitar.
+"""
+from __future__ import annotations
+import asyncio
+from abc import ABC, abstractmethod
+from collections import deque
+from time import perf_counter
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar('T')
+
+
+class AsyncHandler(ABC):
+    def __init__(
+        self,
+        sucessor: AsyncHandler | None = None,
+        timeout: float | None = None,
+        max_concurrency: int | None = None,
+    ) -> None:
+        self.sucessor = sucessor
+        self.timeout = timeout
+        self.timeouts = 0
+        self._semaphore = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        )
+
+    @abstractmethod
+    async def accepts(self, letter: str) -> bool: pass
+
+    @abstractmethod
+    async def process(self, letter: str) -> str: pass
+
+    async def _limited(self, method: Callable[[str], Awaitable[T]],
+                       letter: str) -> T:
+        # A corrotina so e criada depois de conseguir o semaforo, para nao
+        # sobrar corrotina nunca aguardada se a task for cancelada
+        if self._semaphore is None:
+            return await asyncio.wait_for(method(letter), self.timeout)
+        async with self._semaphore:
+            return await asyncio.wait_for(method(letter), self.timeout)
+
+    async def try_accept(self, letter: str) -> bool:
+        try:
+            return await self._limited(self.accepts, letter)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return False
+
+    async def handle(self, letter: str) -> str:
+        handler: AsyncHandler | None = self
+
+        while handler is not None:
+            if await handler.try_accept(letter):
+                return await handler._limited(handler.process, letter)
+            handler = handler.sucessor
+
+        raise LookupError(f'Nenhum handler tratou {letter}')
+
+    async def handle_speculative(self, letter: str, k: int = 3) -> str:
+        if k < 1:
+            raise ValueError('k precisa ser pelo menos 1')
+
+        handler: AsyncHandler | None = self
+        in_flight: deque[tuple[AsyncHandler, asyncio.Task[bool]]] = deque()
+
+        def fill() -> None:
+            nonlocal handler
+            while handler is not None and len(in_flight) < k:
+                task = asyncio.ensure_future(handler.try_accept(letter))
+                in_flight.append((handler, task))
+                handler = handler.sucessor
+
+        fill()
+        try:
+            while in_flight:
+                current, task = in_flight.popleft()
+                if await task:
+                    return await current._limited(current.process, letter)
+                fill()
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+        raise LookupError(f'Nenhum handler tratou {letter}')
+
+
+class AsyncHandlerLetters(AsyncHandler):
+    letters: frozenset[str] = frozenset()
+    # Simula a latencia de uma consulta externa
+    delay = 0.05
+
+    async def accepts(self, letter: str) -> bool:
+        await asyncio.sleep(self.delay)
+        return letter in self.letters
+
+    async def process(self, letter: str) -> str:
+        return f'{type(self).__name__} tratou a letra {letter}'
+
+
+class AsyncHandlerABC(AsyncHandlerLetters):
+    letters = frozenset(['A', 'B', 'C'])
+
+
+class AsyncHandlerDEF(AsyncHandlerLetters):
+    letters = frozenset(['D', 'E', 'F'])
+
+
+class AsyncHandlerUnsolved(AsyncHandler):
+    async def accepts(self, letter: str) -> bool:
+        return True
+
+    async def process(self, letter: str) -> str:
+        return f'{type(self).__name__} nao tratou a letra {letter}'
+
+
+async def main() -> None:
+    handler_unsolved = AsyncHandlerUnsolved()
+    handler_def = AsyncHandlerDEF(handler_unsolved, timeout=1)
+    handler_abc = AsyncHandlerABC(handler_def, timeout=1, max_concurrency=5)
+
+    letters = 'ABCDEFGHI'
+
+    start = perf_counter()
+    results = await asyncio.gather(*(handler_abc.handle(x) for x in letters))
+    print(*results, sep='\n')
+    print(f'Sequencial: {perf_counter() - start:.2f}s')
+    print()
+
+    start = perf_counter()
+    speculative = await asyncio.gather(
+        *(handler_abc.handle_speculative(x, k=3) for x in letters)
+    )
+    assert speculative == results
+    print(f'Especulativo: {perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
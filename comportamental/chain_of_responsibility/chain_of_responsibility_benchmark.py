@@ -0,0 +1,67 @@
+"""
+Benchmark da cadeia percorrida contra a cadeia compilada.
+
+Monta uma cadeia de 1.000 handlers, cada um tratando 10 codigos, e compara
+o tempo medio por solicitacao percorrendo os sucessores e usando a tabela
+compilada. Antes de medir, confere que as duas dao o mesmo resultado.
+"""
+from __future__ import annotations
+import random
+import sys
+from time import perf_counter
+
+from chain_of_responsibility_2 import Handler, HandlerUnsolved
+from chain_of_responsibility_compiled import compile_chain
+
+
+class HandlerCodes(Handler):
+    def __init__(self, codes: frozenset[str], sucessor: Handler) -> None:
+        self.letters = codes
+        self.sucessor = sucessor
+
+    def handle(self, letter: str) -> str:
+        if letter in self.letters:
+            return f'{type(self).__name__} tratou a letra {letter}'
+        return self.sucessor.handle(letter)
+
+
+def build_chain(links: int, codes_per_link: int = 10) -> Handler:
+    handler: Handler = HandlerUnsolved()
+
+    for link in reversed(range(links)):
+        codes = frozenset(f'{link}-{i}' for i in range(codes_per_link))
+        handler = HandlerCodes(codes, handler)
+
+    return handler
+
+
+if __name__ == '__main__':
+    links = 1_000
+    # A cadeia percorrida e recursiva: um elo por frame
+    sys.setrecursionlimit(links + 1_000)
+
+    head = build_chain(links)
+    compiled = compile_chain(head)
+
+    requests = [
+        f'{random.randrange(links * 11 // 10)}-{random.randrange(10)}'
+        for _ in range(20_000)
+    ]
+
+    for request in requests:
+        assert compiled(request) == head.handle(request)
+
+    start = perf_counter()
+    for request in requests:
+        head.handle(request)
+    walked = (perf_counter() - start) / len(requests)
+
+    start = perf_counter()
+    for request in requests:
+        compiled(request)
+    table = (perf_counter() - start) / len(requests)
+
+    print(f'Elos: {links}')
+    print(f'Cadeia percorrida: {walked * 1e6:10.2f} us/solicitacao')
+    print(f'Cadeia compilada:  {table * 1e6:10.2f} us/solicitacao')
+    print(f'Ganho: {walked / table:.0f}x')
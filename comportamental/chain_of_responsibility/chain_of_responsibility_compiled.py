@@ -0,0 +1,126 @@
+"""
+Compilador de cadeias de responsabilidade.
+
+Percorrer a cadeia custa O(tamanho da cadeia) por solicitacao. Quando os
+handlers declaram as chaves que tratam (um conjunto, como `letters`), a
+cadeia pode ser compilada em uma tabela chave -> handler com busca O(1).
+
+Cada elo da cadeia e um par (chaves, handler):
+- chaves e um conjunto: o elo entra na tabela;
+- chaves e um predicado (callable): o elo e testado em ordem;
+- chaves e None: o elo nao e enumeravel e a partir dele a cadeia e
+  percorrida normalmente pelo proprio handler.
+
+Elos enumeraveis consecutivos sao fundidos em uma unica tabela. Se uma
+chave aparece em mais de um elo, vale o primeiro, como na cadeia original.
+"""
+from __future__ import annotations
+from typing import Callable, Collection, Iterable, Iterator, Union
+
+from chain_of_responsibility import (ABC_LETTERS, DEF_LETTERS, handler_ABC,
+                                     handler_DEF, handler_unsolved)
+from chain_of_responsibility_2 import (Handler, HandlerABC, HandlerDEF,
+                                       HandlerUnsolved)
+
+HandleFunc = Callable[[str], str]
+Keys = Union[Collection[str], Callable[[str], bool], None]
+Link = tuple[Keys, HandleFunc]
+Predicate = tuple[Callable[[str], bool], HandleFunc]
+
+
+class CompiledChain:
+    def __init__(self, links: Iterable[Link]) -> None:
+        # Cada estagio e uma tabela ou um par (predicado, handler)
+        self._stages: list[dict[str, HandleFunc] | Predicate] = []
+        self._fallback: HandleFunc | None = None
+        table: dict[str, HandleFunc] = {}
+
+        for keys, handle in links:
+            if keys is None:
+                # Daqui em diante a cadeia e percorrida pelo proprio handler
+                self._fallback = handle
+                break
+
+            if callable(keys):
+                if table:
+                    self._stages.append(table)
+                    table = {}
+                self._stages.append((keys, handle))
+                continue
+
+            for key in keys:
+                table.setdefault(key, handle)
+
+        if table:
+            self._stages.append(table)
+
+        if len(self._stages) == 1 and isinstance(self._stages[0], dict):
+            self._table = self._stages[0]
+            self.handle = self._handle_table  # type: ignore[method-assign]
+
+    def _handle_table(self, letter: str) -> str:
+        # Caminho rapido: uma unica tabela seguida do fallback
+        handle = self._table.get(letter, self._fallback)
+
+        if handle is None:
+            raise LookupError(f'Nenhum handler tratou {letter}')
+
+        return handle(letter)
+
+    def handle(self, letter: str) -> str:
+        for stage in self._stages:
+            if isinstance(stage, dict):
+                handle = stage.get(letter)
+                if handle is not None:
+                    return handle(letter)
+            elif stage[0](letter):
+                return stage[1](letter)
+
+        if self._fallback is None:
+            raise LookupError(f'Nenhum handler tratou {letter}')
+
+        return self._fallback(letter)
+
+    def __call__(self, letter: str) -> str:
+        return self.handle(letter)
+
+
+def handler_links(head: Handler) -> Iterator[Link]:
+    # Percorre os sucessores de uma cadeia de objetos Handler. Um handler
+    # e enumeravel se tiver `letters`; se tiver `can_handle`, vira
+    # predicado; caso contrario a cadeia e percorrida a partir dele.
+    handler: Handler | None = head
+
+    while handler is not None:
+        letters = getattr(handler, 'letters', None)
+        if letters is None:
+            letters = getattr(handler, 'can_handle', None)
+
+        yield letters, handler.handle
+
+        if letters is None:
+            return
+
+        handler = getattr(handler, 'sucessor', None)
+
+
+def compile_chain(chain: Handler | Iterable[Link]) -> CompiledChain:
+    if isinstance(chain, Handler):
+        return CompiledChain(handler_links(chain))
+    return CompiledChain(chain)
+
+
+if __name__ == '__main__':
+    functions = compile_chain([
+        (ABC_LETTERS, handler_ABC),
+        (DEF_LETTERS, handler_DEF),
+        (None, handler_unsolved),
+    ])
+
+    handler_abc = HandlerABC(HandlerDEF(HandlerUnsolved()))
+    objects = compile_chain(handler_abc)
+
+    for letter in 'ABCDEFGHI':
+        assert functions(letter) == handler_ABC(letter)
+        assert objects(letter) == handler_abc.handle(letter)
+        print(functions(letter), '|', objects(letter))
@@ -11,6 +11,9 @@ ação no final).
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from array import array
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
 
 
 class Light:
@@ -20,17 +23,32 @@ class Light:
         self.name = name
         self.room_name = room_name
         self.color = 'Default color'
+        self.is_on = False
 
     def on(self) -> None:
+        self.is_on = True
         print(f'A {self.name} no {self.room_name} esta LIGADA')
 
     def off(self) -> None:
+        self.is_on = False
         print(f'A {self.name} no {self.room_name} esta DESLIGADA')
 
     def change_color(self, color: str) -> None:
         self.color = color
         print(f'A {self.name} no {self.room_name} esta {self.color}')
 
+    def state(self, fields: Iterable[str]) -> dict[str, Any]:
+        return {field: getattr(self, field) for field in fields}
+
+    def apply(self, **changes: Any) -> None:
+        # Aplica varias alteracoes em uma unica chamada ao receiver
+        for field, value in changes.items():
+            setattr(self, field, value)
+
+        status = 'LIGADA' if self.is_on else 'DESLIGADA'
+        print(f'A {self.name} no {self.room_name} esta {status} '
+              f'({self.color})')
+
 
 class ICommand(ABC):
     # Interface de comando
@@ -41,6 +59,29 @@ class ICommand(ABC):
     @abstractmethod
     def undo(self) -> None: pass
 
+    def changes(self) -> tuple[Light, dict[str, Any]] | None:
+        # Comandos que apenas alteram atributos de um Light podem ser
+        # agrupados pelo MacroCommand em uma unica chamada por Light
+        return None
+
+    def undo_changes(self) -> dict[str, Any] | None:
+        # Alteracoes que undo() faria no Light de changes()
+        return None
+
+    def executed(self, before: dict[str, Any]) -> None:
+        # Chamado quando o MacroCommand aplicou changes() em lote no lugar
+        # de execute(), com os valores dos campos antes do comando. Serve
+        # para o comando guardar o que o undo() precisa.
+        pass
+
+    def undo_state(self) -> dict[str, Any]:
+        # O que o undo() precisa, em um dict serializavel em JSON (usado
+        # pelos snapshots do journal)
+        return {}
+
+    def restore_undo_state(self, state: dict[str, Any]) -> None:
+        pass
+
 
 class LightOnCommand(ICommand):
     # Comando concreto
@@ -54,6 +95,12 @@ class LightOnCommand(ICommand):
     def undo(self) -> None:
         self.light.off()
 
+    def changes(self) -> tuple[Light, dict[str, Any]] | None:
+        return self.light, {'is_on': True}
+
+    def undo_changes(self) -> dict[str, Any] | None:
+        return {'is_on': False}
+
 
 class LightChangeColor(ICommand):
     # Comando concreto
@@ -70,39 +117,361 @@ class LightChangeColor(ICommand):
     def undo(self) -> None:
         self.light.change_color(self._old_color)
 
+    def changes(self) -> tuple[Light, dict[str, Any]] | None:
+        return self.light, {'color': self.color}
+
+    def undo_changes(self) -> dict[str, Any] | None:
+        return {'color': self._old_color}
+
+    def executed(self, before: dict[str, Any]) -> None:
+        self._old_color = before['color']
+
+    def undo_state(self) -> dict[str, Any]:
+        return {'old_color': self._old_color}
+
+    def restore_undo_state(self, state: dict[str, Any]) -> None:
+        self._old_color = state['old_color']
+
+
+class MacroCommand(ICommand):
+    # Executa um grupo de comandos como uma unidade: uma unica entrada no
+    # historico de undo e, se algum membro falhar, o que ja foi feito e
+    # desfeito antes de propagar o erro.
+    # Com batch=True, comandos agrupaveis consecutivos sao combinados em
+    # uma unica chamada Light.apply por Light. O resultado (inclusive do
+    # undo) e o mesmo de executar os membros um a um: cada membro recebe
+    # executed() para guardar o que seu undo() precisa, e o undo em lote
+    # combina os undo_changes() dos membros em ordem reversa.
+
+    def __init__(self, commands: Iterable[ICommand], batch: bool = True):
+        self.commands = list(commands)
+        self.batch = batch
+        # Segmentos executados, na ordem; o undo percorre ao contrario
+        self._done: list[list[ICommand]] = []
+
+    def _batchable(self, command: ICommand) -> bool:
+        return (
+            self.batch
+            and command.changes() is not None
+            and command.undo_changes() is not None
+        )
+
+    def _segments(self) -> Iterator[list[ICommand]]:
+        # Sequencias de comandos agrupaveis; os demais vao sozinhos
+        segment: list[ICommand] = []
+
+        for command in self.commands:
+            if self._batchable(command):
+                segment.append(command)
+                continue
+
+            if segment:
+                yield segment
+                segment = []
+            yield [command]
+
+        if segment:
+            yield segment
+
+    @staticmethod
+    def _apply(merged: dict[Light, dict[str, Any]]) -> None:
+        # Aplica por Light; se um falhar, volta os que ja foram aplicados
+        applied: list[tuple[Light, dict[str, Any]]] = []
+
+        try:
+            for light, changes in merged.items():
+                previous = light.state(changes)
+                light.apply(**changes)
+                applied.append((light, previous))
+        except Exception:
+            for light, previous in reversed(applied):
+                light.apply(**previous)
+            raise
+
+    @classmethod
+    def _execute_batch(cls, segment: list[ICommand]) -> None:
+        merged: dict[Light, dict[str, Any]] = {}
+
+        for command in segment:
+            light, changes = command.changes()  # type: ignore[misc]
+            pending = merged.setdefault(light, {})
+            command.executed({
+                field: pending.get(field, getattr(light, field))
+                for field in changes
+            })
+            pending.update(changes)
+
+        cls._apply(merged)
+
+    @classmethod
+    def _undo_batch(cls, segment: list[ICommand]) -> None:
+        merged: dict[Light, dict[str, Any]] = {}
+
+        for command in reversed(segment):
+            light, _ = command.changes()  # type: ignore[misc]
+            merged.setdefault(light, {}).update(
+                command.undo_changes()  # type: ignore[arg-type]
+            )
+
+        cls._apply(merged)
+
+    def _undo_segments(self, done: list[list[ICommand]]) -> None:
+        for segment in reversed(done):
+            if self._batchable(segment[0]):
+                self._undo_batch(segment)
+            else:
+                segment[0].undo()
+
+    def execute(self) -> None:
+        done: list[list[ICommand]] = []
+
+        try:
+            for segment in self._segments():
+                if self._batchable(segment[0]):
+                    self._execute_batch(segment)
+                else:
+                    segment[0].execute()
+                done.append(segment)
+        except Exception:
+            self._undo_segments(done)
+            raise
+
+        self._done = done
+
+    def undo(self) -> None:
+        self._undo_segments(self._done)
+        self._done = []
+
+    def undo_state(self) -> dict[str, Any]:
+        return {
+            'done': len(self._done),
+            'members': [command.undo_state() for command in self.commands],
+        }
+
+    def restore_undo_state(self, state: dict[str, Any]) -> None:
+        for command, member in zip(self.commands, state['members']):
+            command.restore_undo_state(member)
+        self._done = list(self._segments())[:state['done']]
+
+
+# Codigos das acoes gravadas no historico
+EXECUTE = 0
+UNDO = 1
+
+
+class CommandHistory:
+    # Ring buffer de tamanho fixo. Cada entrada e um unico inteiro:
+    # (id do botao << 1) | acao. Quando enche, a entrada mais antiga e
+    # sobrescrita, entao memoria e tempo sao O(1) independente do uptime.
+    def __init__(self, maxlen: int = 1024) -> None:
+        if maxlen < 1:
+            raise ValueError('O historico precisa de ao menos uma entrada')
+
+        self.maxlen = maxlen
+        self._entries = array('q', bytes(8 * maxlen))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, button_id: int, action: int) -> None:
+        index = (self._start + self._size) % self.maxlen
+        self._entries[index] = button_id << 1 | action
+
+        if self._size == self.maxlen:
+            self._start = (self._start + 1) % self.maxlen
+        else:
+            self._size += 1
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        # Do mais antigo ao mais novo
+        for offset in range(self._size):
+            entry = self._entries[(self._start + offset) % self.maxlen]
+            yield entry >> 1, entry & 1
+
+    def pop(self) -> tuple[int, int]:
+        if not self._size:
+            raise IndexError('Historico vazio')
+
+        self._size -= 1
+        entry = self._entries[(self._start + self._size) % self.maxlen]
+        return entry >> 1, entry & 1
+
 
 class RemoteController:
     # Invoker
 
-    def __init__(self) -> None:
+    def __init__(self, max_history: int = 1024) -> None:
         self._buttons: dict[str, ICommand] = {}
-        self._undos: list[tuple[str, str]] = []
+        # Nomes de botoes internados como ids inteiros
+        self._button_ids: dict[str, int] = {}
+        self._commands: list[ICommand] = []
+        self._undos = CommandHistory(max_history)
+        # Desfeitos pelo global_undo, limitados pelo tamanho do historico
+        self._redos = array('q')
+        # Botoes apertados dentro de coalescing(), ainda nao executados
+        self._pending: list[tuple[str, int]] | None = None
+        self.saved_calls = 0
 
     def button_add_command(self, name: str, command: ICommand) -> None:
+        # Cada comando ganha um id proprio, mesmo quando o botao e
+        # reconfigurado: as entradas antigas do historico continuam
+        # apontando para o comando que foi de fato executado
+        if self._buttons.get(name) is command:
+            return
+
         self._buttons[name] = command
+        self._button_ids[name] = len(self._commands)
+        self._commands.append(command)
+
+    def _record(self, name: str, action: int) -> None:
+        self._undos.push(self._button_ids[name], action)
+        del self._redos[:]
+
+    @property
+    def buffering(self) -> bool:
+        return self._pending is not None
+
+    def _buffer(self, name: str, action: int) -> bool:
+        # Dentro de coalescing(), guarda o botao para o flush. Subclasses
+        # que redefinem button_execute/button_undo devem chamar isto antes
+        # de executar.
+        if self._pending is None:
+            return False
+
+        self._pending.append((name, action))
+        return True
 
     def button_execute(self, name: str) -> None:
-        if name in self._buttons:
+        if name in self._buttons and not self._buffer(name, EXECUTE):
             self._buttons[name].execute()
-            self._undos.append((name, 'execute'))
+            self._record(name, EXECUTE)
 
     def button_undo(self, name: str) -> None:
-        if name in self._buttons:
+        if name in self._buttons and not self._buffer(name, UNDO):
             self._buttons[name].undo()
-            self._undos.append((name, 'undo'))
+            self._record(name, UNDO)
+
+    @contextmanager
+    def coalescing(self) -> Iterator[None]:
+        # Os botoes apertados dentro do bloco sao combinados antes de
+        # executar (veja _coalesce) e executados na saida do bloco. Se o
+        # bloco levantar uma excecao, os botoes guardados sao descartados.
+        self.flush()
+        self._pending = []
+        try:
+            yield
+        except BaseException:
+            self._pending = None
+            raise
+        self.flush()
+
+    def flush(self) -> None:
+        if self._pending is None:
+            return
+
+        pending, self._pending = self._pending, None
+
+        for name, action in self._coalesce(pending):
+            if action == EXECUTE:
+                self.button_execute(name)
+            else:
+                self.button_undo(name)
+
+    def _coalesce(
+        self, pending: list[tuple[str, int]]
+    ) -> list[tuple[str, int]]:
+        # Combina comandos consecutivos no mesmo Light:
+        # - varias trocas de cor viram so a ultima (uma entrada de undo,
+        #   que volta para a cor de antes da sequencia);
+        # - ligar e em seguida desfazer o ligar de uma luz que estava
+        #   desligada nao muda nada e e removido.
+        result: list[tuple[str, int, bool | None]] = []
+        is_on: dict[Light, bool] = {}
+
+        for name, action in pending:
+            command = self._buttons[name]
+            light: Light | None = getattr(command, 'light', None)
+
+            if result and isinstance(light, Light):
+                last_name, last_action, was_on = result[-1]
+                last = self._buttons[last_name]
+                last_light: Light | None = getattr(last, 'light', None)
+
+                if last_light is light:
+                    if (
+                        isinstance(command, LightChangeColor)
+                        and isinstance(last, LightChangeColor)
+                        and action == last_action == EXECUTE
+                    ):
+                        result[-1] = (name, action, was_on)
+                        self.saved_calls += 1
+                        continue
+
+                    if (
+                        isinstance(command, LightOnCommand)
+                        and isinstance(last, LightOnCommand)
+                        and last_action == EXECUTE and action == UNDO
+                        and was_on is False
+                    ):
+                        result.pop()
+                        is_on[light] = False
+                        self.saved_calls += 2
+                        continue
+
+            before = None
+            if isinstance(light, Light):
+                before = is_on.get(light, light.is_on)
+                if isinstance(command, LightOnCommand):
+                    is_on[light] = action == EXECUTE
+
+            result.append((name, action, before))
+
+        return [(name, action) for name, action, _ in result]
 
     def global_undo(self):
+        self.flush()
+
         if not self._undos:
             return None
 
-        button_name, action = self._undos[-1]
+        button_id, action = self._undos.pop()
+        command = self._commands[button_id]
 
-        if action == 'execute':
-            self._buttons[button_name].undo()
+        if action == EXECUTE:
+            command.undo()
         else:
-            self._buttons[button_name].execute()
+            command.execute()
 
-        self._undos.pop()
+        self._redos.append(button_id << 1 | action)
+
+    @contextmanager
+    def transaction(self, name: str) -> Iterator[list[ICommand]]:
+        # Os comandos adicionados dentro do bloco sao executados juntos,
+        # como o botao `name`, gerando uma unica entrada de undo. Cada
+        # transacao e um MacroCommand novo, com seu proprio id no historico
+        commands: list[ICommand] = []
+        yield commands
+        self.button_add_command(name, MacroCommand(commands))
+        self.button_execute(name)
+
+    def global_redo(self):
+        self.flush()
+
+        if not self._redos:
+            return None
+
+        entry = self._redos.pop()
+        button_id, action = entry >> 1, entry & 1
+        command = self._commands[button_id]
+
+        if action == EXECUTE:
+            command.execute()
+        else:
+            command.undo()
+
+        self._undos.push(button_id, action)
 
 
 if __name__ == '__main__':
@@ -130,3 +499,34 @@ if __name__ == '__main__':
     remote.global_undo()
     remote.global_undo()
     remote.global_undo()
+
+    print()
+    remote.global_redo()
+    remote.global_redo()
+
+    print()
+    kitchen_light = Light('Luz', 'Cozinha')
+    with remote.transaction('scene_dinner') as scene:
+        scene.append(LightOnCommand(kitchen_light))
+        scene.append(LightChangeColor(kitchen_light, 'Amarelo'))
+        scene.append(LightOnCommand(bathroom_light))
+        scene.append(LightChangeColor(bathroom_light, 'Vermelho'))
+        scene.append(LightChangeColor(bathroom_light, 'Laranja'))
+
+    print()
+    remote.global_undo()
+
+    print()
+    for color in ('Azul', 'Verde', 'Vermelho'):
+        remote.button_add_command(color,
+                                  LightChangeColor(bedroom_light, color))
+
+    with remote.coalescing():
+        remote.button_execute('first_button')
+        remote.button_undo('first_button')
+        remote.button_execute('Azul')
+        remote.button_execute('Verde')
+        remote.button_execute('Vermelho')
+
+    print('Chamadas economizadas:', remote.saved_calls)
+    remote.global_undo()
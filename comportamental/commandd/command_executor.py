@@ -0,0 +1,224 @@
+"""
+Execucao de comandos em segundo plano.
+
+O CommandExecutor coloca os comandos em filas por receiver e roda essas
+filas em um pool de threads:
+- comandos para o mesmo receiver (o mesmo Light) rodam na ordem em que
+  foram enviados, um de cada vez;
+- comandos para receivers diferentes rodam em paralelo.
+
+Um comando com varios receivers (um MacroCommand) entra na fila de todos
+eles e so roda quando for o primeiro de todas essas filas. Como ele entra
+em todas as filas de uma vez, na ordem global de envio, nao ha deadlock.
+
+Quem envia recebe um Future. O executor informa quantos comandos estao na
+fila e a latencia (do envio ate o fim da execucao) de cada comando.
+"""
+from __future__ import annotations
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter, sleep
+from typing import Any, Callable, Hashable
+
+from command import (EXECUTE, UNDO, ICommand, Light, LightChangeColor,
+                     LightOnCommand, MacroCommand, RemoteController)
+
+
+def receivers_of(command: ICommand) -> tuple[Hashable, ...]:
+    if isinstance(command, MacroCommand):
+        # dict.fromkeys remove repetidos mantendo a ordem
+        return tuple(dict.fromkeys(
+            receiver for member in command.commands
+            for receiver in receivers_of(member)
+        ))
+
+    changes = command.changes()
+    if changes is not None:
+        return (changes[0],)
+    return (getattr(command, 'light', command),)
+
+
+class _Task:
+    __slots__ = ('method', 'future', 'submitted', 'keys')
+
+    def __init__(
+        self,
+        method: Callable[[], Any],
+        future: Future,
+        keys: tuple[Hashable, ...],
+    ) -> None:
+        self.method = method
+        self.future = future
+        self.submitted = perf_counter()
+        self.keys = keys
+
+
+class CommandExecutor:
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        receivers: Callable[[ICommand], tuple[Hashable, ...]] = receivers_of,
+    ) -> None:
+        self._pool = ThreadPoolExecutor(max_workers)
+        self._receivers = receivers
+        self._lock = threading.Lock()
+        # Avisa o shutdown() quando todas as filas esvaziam
+        self._idle = threading.Condition(self._lock)
+        # Fila de cada receiver com trabalho pendente ou em execucao; o
+        # primeiro da fila e o que esta rodando ou esperando outras filas
+        self._queues: dict[Hashable, deque[_Task]] = {}
+        self.queue_depth = 0
+        self.completed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _ready(self, task: _Task) -> bool:
+        # Chamado com o lock adquirido
+        return all(self._queues[key][0] is task for key in task.keys)
+
+    def submit(self, command: ICommand, action: int = EXECUTE) -> Future:
+        method = command.execute if action == EXECUTE else command.undo
+        future: Future = Future()
+        keys = tuple(dict.fromkeys(self._receivers(command))) or (command,)
+        task = _Task(method, future, keys)
+
+        with self._lock:
+            self.queue_depth += 1
+            for key in keys:
+                self._queues.setdefault(key, deque()).append(task)
+            ready = self._ready(task)
+
+        if ready:
+            self._pool.submit(self._run, task)
+        return future
+
+    def _run(self, task: _Task) -> None:
+        if task.future.set_running_or_notify_cancel():
+            try:
+                task.future.set_result(task.method())
+            except BaseException as error:
+                task.future.set_exception(error)
+
+        latency = perf_counter() - task.submitted
+        ready: list[_Task] = []
+
+        with self._lock:
+            self.queue_depth -= 1
+            self.completed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+            for key in task.keys:
+                queue = self._queues[key]
+                queue.popleft()
+                if not queue:
+                    del self._queues[key]
+                elif self._ready(queue[0]) and queue[0] not in ready:
+                    ready.append(queue[0])
+
+            if not self._queues:
+                self._idle.notify_all()
+
+        for next_task in ready:
+            self._pool.submit(self._run, next_task)
+
+    @property
+    def mean_latency(self) -> float:
+        if not self.completed:
+            return 0.0
+        return self.total_latency / self.completed
+
+    def shutdown(self) -> None:
+        # Espera todas as filas esvaziarem
+        with self._idle:
+            self._idle.wait_for(lambda: not self._queues)
+        self._pool.shutdown()
+
+
+class BackgroundRemoteController(RemoteController):
+    # Invoker que envia os comandos ao executor em vez de roda-los na
+    # thread de quem apertou o botao. O historico de undo e gravado na
+    # ordem de envio.
+
+    def __init__(
+        self, executor: CommandExecutor, max_history: int = 1024
+    ) -> None:
+        super().__init__(max_history)
+        self.executor = executor
+
+    # Dentro de coalescing(), os botoes sao guardados e nao ha Future: os
+    # comandos combinados sao enviados ao executor no flush
+
+    def button_execute(self, name: str) -> Future | None:  # type: ignore
+        if name not in self._buttons or self._buffer(name, EXECUTE):
+            return None
+
+        self._record(name, EXECUTE)
+        return self.executor.submit(self._buttons[name], EXECUTE)
+
+    def button_undo(self, name: str) -> Future | None:  # type: ignore
+        if name not in self._buttons or self._buffer(name, UNDO):
+            return None
+
+        self._record(name, UNDO)
+        return self.executor.submit(self._buttons[name], UNDO)
+
+    def global_undo(self) -> Future | None:
+        self.flush()
+        if not self._undos:
+            return None
+
+        button_id, action = self._undos.pop()
+        self._redos.append(button_id << 1 | action)
+        return self.executor.submit(
+            self._commands[button_id], UNDO if action == EXECUTE else EXECUTE
+        )
+
+    def global_redo(self) -> Future | None:
+        self.flush()
+        if not self._redos:
+            return None
+
+        entry = self._redos.pop()
+        button_id, action = entry >> 1, entry & 1
+        self._undos.push(button_id, action)
+        return self.executor.submit(self._commands[button_id], action)
+
+
+class SlowLight(Light):
+    # Simula um receiver lento (rede, bluetooth...)
+    def change_color(self, color: str) -> None:
+        sleep(0.05)
+        super().change_color(color)
+
+
+if __name__ == '__main__':
+    executor = CommandExecutor(max_workers=4)
+    remote = BackgroundRemoteController(executor)
+
+    lights = [SlowLight('Luz', room) for room in ('Quarto', 'Sala', 'Cozinha')]
+
+    for light in lights:
+        remote.button_add_command(f'{light.room_name}_on',
+                                  LightOnCommand(light))
+        for color in ('Azul', 'Verde', 'Vermelho'):
+            remote.button_add_command(f'{light.room_name}_{color}',
+                                      LightChangeColor(light, color))
+
+    start = perf_counter()
+    futures = []
+    for color in ('Azul', 'Verde', 'Vermelho'):
+        for light in lights:
+            futures.append(remote.button_execute(f'{light.room_name}_{color}'))
+
+    print('Comandos na fila:', executor.queue_depth)
+    for future in futures:
+        future.result()
+
+    print(f'Tempo total: {perf_counter() - start:.2f}s')
+    print(f'Latencia media: {executor.mean_latency * 1e3:.1f}ms, '
+          f'maxima: {executor.max_latency * 1e3:.1f}ms')
+    # Cada luz recebeu as cores na ordem de envio
+    print([light.color for light in lights])
+    executor.shutdown()
@@ -0,0 +1,316 @@
+"""
+Journal (write-ahead log) dos comandos do RemoteController.
+
+Cada botao executado, desfeito ou global_undo/global_redo vira uma linha
+JSON no arquivo de journal. Para nao fazer um fsync por comando, as linhas
+sao gravadas em grupo (group commit): o fsync acontece quando o grupo
+atinge `group_size` registros ou a cada `interval` segundos, o que vier
+primeiro.
+
+Cada registro e gravado antes de a acao ser aplicada (write-ahead). Se a
+acao levanta uma excecao, um registro 'abort' logo depois a anula, e o
+replay a ignora.
+
+Na inicializacao, replay() restaura o ultimo snapshot e reaplica o
+journal. O snapshot guarda o estado das Lights, o historico de
+undo/redo (por nome de botao) e o que o undo() de cada comando precisa
+(ICommand.undo_state), para que um global_undo gravado depois do
+snapshot desfaca o mesmo comando, do mesmo jeito, no replay. Um checkpoint
+grava um novo snapshot e trunca o journal, para que o tempo de replay
+fique limitado.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from typing import Any, Callable, Iterator
+
+from command import (ICommand, Light, LightChangeColor, LightOnCommand,
+                     MacroCommand, RemoteController)
+
+
+class CommandJournal:
+    def __init__(
+        self, path: str, group_size: int = 64, interval: float = 0.05
+    ) -> None:
+        self.path = path
+        self.snapshot_path = f'{path}.snapshot'
+        self.group_size = group_size
+        self.interval = interval
+        self.syncs = 0
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._run, daemon=True)
+        self._flusher.start()
+
+    def append(self, op: str, button: str) -> None:
+        with self._lock:
+            self._file.write(json.dumps([op, button]) + '\n')
+            self._pending += 1
+            if self._pending >= self.group_size:
+                self._sync()
+
+    def _sync(self) -> None:
+        # Chamado com o lock adquirido
+        if not self._pending:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self.syncs += 1
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.interval):
+            self.sync()
+
+    def records(self) -> Iterator[tuple[str, str]]:
+        if not os.path.exists(self.path):
+            return
+
+        # Um registro seguido de 'abort' falhou ao ser aplicado e e omitido
+        last: tuple[str, str] | None = None
+
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    op, button = json.loads(line)
+                except ValueError:
+                    # Ultima linha incompleta (queda no meio da escrita)
+                    break
+                if op == 'abort':
+                    last = None
+                    continue
+                if last is not None:
+                    yield last
+                last = op, button
+
+        if last is not None:
+            yield last
+
+    def read_snapshot(self) -> dict[str, Any]:
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_snapshot(self, state: dict[str, Any]) -> None:
+        # Grava o snapshot de forma atomica e so entao trunca o journal
+        with self._lock:
+            self._sync()
+            tmp = f'{self.snapshot_path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp, self.snapshot_path)
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+
+def _lights(command: ICommand) -> Iterator[Light]:
+    if isinstance(command, MacroCommand):
+        for member in command.commands:
+            yield from _lights(member)
+    elif isinstance(getattr(command, 'light', None), Light):
+        yield command.light  # type: ignore[attr-defined]
+
+
+class JournaledRemoteController(RemoteController):
+    # Invoker que registra cada acao no journal antes de retornar
+
+    def __init__(
+        self,
+        journal: CommandJournal,
+        max_history: int = 1024,
+        snapshot_every: int = 10_000,
+    ) -> None:
+        super().__init__(max_history)
+        self.journal = journal
+        self.snapshot_every = snapshot_every
+        self._since_snapshot = 0
+        self._replaying = False
+        # Registros que falharam no ultimo replay
+        self.replay_failures = 0
+
+    def _log(self, op: str, button: str = '') -> bool:
+        # Dentro de coalescing() so o resultado combinado e registrado,
+        # quando o flush chama button_execute/button_undo de novo
+        if self._replaying or self.buffering:
+            return False
+
+        self.journal.append(op, button)
+        self._since_snapshot += 1
+        return True
+
+    def _logged(
+        self, action: Callable[..., Any], op: str, button: str = ''
+    ) -> None:
+        # Registra, aplica e, se a acao falhar, anula o registro
+        logged = self._log(op, button)
+        try:
+            if button:
+                action(button)
+            else:
+                action()
+        except BaseException:
+            if logged:
+                self.journal.append('abort', '')
+            raise
+        self._maybe_checkpoint()
+
+    def _maybe_checkpoint(self) -> None:
+        # So depois de aplicar a acao: o checkpoint trunca o journal, entao
+        # o snapshot precisa inclui-la
+        if self._since_snapshot >= self.snapshot_every:
+            self.checkpoint()
+
+    def button_execute(self, name: str) -> None:
+        if name in self._buttons:
+            self._logged(super().button_execute, 'execute', name)
+
+    def button_undo(self, name: str) -> None:
+        if name in self._buttons:
+            self._logged(super().button_undo, 'undo', name)
+
+    def global_undo(self):
+        self.flush()
+        if self._undos:
+            self._logged(super().global_undo, 'global_undo')
+
+    def global_redo(self):
+        self.flush()
+        if self._redos:
+            self._logged(super().global_redo, 'global_redo')
+
+    def lights(self) -> dict[str, Light]:
+        return {
+            f'{light.name}@{light.room_name}': light
+            for command in self._commands for light in _lights(command)
+        }
+
+    def checkpoint(self) -> None:
+        names = {
+            button_id: name for name, button_id in self._button_ids.items()
+        }
+        state = {
+            'lights': {
+                key: light.state(['is_on', 'color'])
+                for key, light in self.lights().items()
+            },
+            # Entradas de comandos substituidos no botao (uma transacao
+            # anterior, por exemplo) nao tem nome para recriar no replay
+            'undos': [
+                [names[button_id], action]
+                for button_id, action in self._undos if button_id in names
+            ],
+            'redos': [
+                [names[entry >> 1], entry & 1]
+                for entry in self._redos if entry >> 1 in names
+            ],
+            'commands': {
+                name: command.undo_state()
+                for name, command in self._buttons.items()
+            },
+        }
+        self.journal.write_snapshot(state)
+        self._since_snapshot = 0
+
+    def _restore(self, snapshot: dict[str, Any]) -> None:
+        lights = self.lights()
+        for key, state in snapshot.get('lights', {}).items():
+            if key in lights:
+                lights[key].__dict__.update(state)
+
+        for name, state in snapshot.get('commands', {}).items():
+            if name in self._buttons:
+                self._buttons[name].restore_undo_state(state)
+
+        for name, action in snapshot.get('undos', []):
+            if name in self._button_ids:
+                self._undos.push(self._button_ids[name], action)
+
+        for name, action in snapshot.get('redos', []):
+            if name in self._button_ids:
+                self._redos.append(self._button_ids[name] << 1 | action)
+
+    def replay(self) -> int:
+        # Os botoes precisam estar cadastrados antes do replay
+        self._restore(self.journal.read_snapshot())
+
+        self._replaying = True
+        self.replay_failures = 0
+        replayed = 0
+        try:
+            for op, button in self.journal.records():
+                # Um registro sem 'abort' pode ter falhado antes de o abort
+                # ser gravado (queda); a falha nao interrompe o replay
+                try:
+                    if op == 'execute':
+                        self.button_execute(button)
+                    elif op == 'undo':
+                        self.button_undo(button)
+                    elif op == 'global_undo':
+                        self.global_undo()
+                    elif op == 'global_redo':
+                        self.global_redo()
+                except Exception:
+                    self.replay_failures += 1
+                replayed += 1
+        finally:
+            self._replaying = False
+
+        self._since_snapshot = replayed
+        return replayed
+
+
+def build_remote(journal: CommandJournal) -> JournaledRemoteController:
+    bedroom_light = Light('Luz', 'Quarto')
+    remote = JournaledRemoteController(journal, snapshot_every=4)
+    remote.button_add_command('on', LightOnCommand(bedroom_light))
+    remote.button_add_command('blue', LightChangeColor(bedroom_light, 'Azul'))
+    remote.button_add_command('red', LightChangeColor(bedroom_light, 'Red'))
+    return remote
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'remote.journal')
+
+        journal = CommandJournal(path)
+        remote = build_remote(journal)
+        remote.button_execute('on')
+        remote.button_execute('blue')
+        remote.button_execute('red')
+        remote.button_execute('blue')
+        remote.button_execute('red')
+        remote.global_undo()
+        journal.close()
+        print('Estado antes do restart:',
+              {key: light.state(['is_on', 'color'])
+               for key, light in remote.lights().items()})
+        print('fsyncs:', journal.syncs)
+        print()
+
+        # Novo processo: reconstroi o estado a partir do snapshot + journal
+        journal = CommandJournal(path)
+        remote = build_remote(journal)
+        print('Registros reaplicados:', remote.replay())
+        print({key: light.state(['is_on', 'color'])
+               for key, light in remote.lights().items()})
+        journal.close()
@@ -9,6 +9,10 @@ interações independentemente.
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Sequence
 
 
 class Colleague(ABC):
@@ -49,42 +53,136 @@ class Mediator(ABC):
         pass
 
 
+@dataclass
+class BroadcastStats:
+    receivers: int
+    shards: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        # Entregas por segundo
+        if not self.seconds:
+            return 0.0
+        return self.receivers / self.seconds
+
+
+class FanOut:
+    # Divide os destinatarios em shards e entrega cada shard como um lote
+    # em uma thread do pool. Salas pequenas (um unico shard) sao entregues
+    # na propria thread, sem custo de pool.
+    # Atencao: com mais de um shard, Colleague.direct e chamado a partir
+    # de threads do pool.
+    def __init__(
+        self, shard_size: int = 4096, max_workers: int | None = None
+    ) -> None:
+        if shard_size < 1:
+            raise ValueError('O shard precisa de ao menos um destinatario')
+
+        self.shard_size = shard_size
+        self.max_workers = max_workers
+        self._pool: ThreadPoolExecutor | None = None
+
+    def deliver(
+        self, receivers: Sequence[Colleague], msg: str
+    ) -> BroadcastStats:
+        start = perf_counter()
+        shards = [
+            receivers[i:i + self.shard_size]
+            for i in range(0, len(receivers), self.shard_size)
+        ]
+
+        if len(shards) == 1:
+            self._deliver_shard(shards[0], msg)
+        elif shards:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers)
+            for _ in self._pool.map(self._deliver_shard, shards,
+                                    [msg] * len(shards)):
+                pass
+
+        return BroadcastStats(
+            len(receivers), len(shards), perf_counter() - start
+        )
+
+    @staticmethod
+    def _deliver_shard(shard: Sequence[Colleague], msg: str) -> None:
+        for colleague in shard:
+            colleague.direct(msg)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
 class Chatroom(Mediator):
     # Concrete mediator
-    def __init__(self):
-        self.colleagues: list[Colleague] = []
+    # Mantem um indice nome -> colleague e um conjunto de identidade para
+    # que is_colleague, add, remove e direct sejam O(1) independente do
+    # tamanho da sala. Os nomes sao unicos dentro de uma sala: adicionar um
+    # colleague diferente com um nome ja usado levanta ValueError.
+    def __init__(self, fanout: FanOut | None = None):
+        self._by_name: dict[str, Colleague] = {}
+        self._members: set[Colleague] = set()
+        self.fanout = fanout or FanOut()
+        self.last_broadcast: BroadcastStats | None = None
+
+    @property
+    def colleagues(self) -> list[Colleague]:
+        # Ordem de entrada preservada pelo dict
+        return list(self._by_name.values())
 
     def is_colleague(self, colleague: Colleague) -> bool:
-        return colleague in self.colleagues
+        return colleague in self._members
+
+    def get(self, name: str) -> Colleague | None:
+        return self._by_name.get(name)
 
     def add(self, colleague: Colleague) -> None:
-        if not self.is_colleague(colleague):
-            self.colleagues.append(colleague)
+        if self.is_colleague(colleague):
+            return
+
+        if colleague.name in self._by_name:
+            raise ValueError(
+                f'Ja existe um colleague chamado {colleague.name} na sala'
+            )
+
+        self._by_name[colleague.name] = colleague
+        self._members.add(colleague)
 
     def remove(self, colleague: Colleague) -> None:
-        if self.is_colleague(colleague):
-            self.colleagues.remove(colleague)
+        if not self.is_colleague(colleague):
+            return
+
+        self._members.discard(colleague)
+        del self._by_name[colleague.name]
+
+    def __len__(self) -> int:
+        return len(self._members)
 
     def broadcast(self, colleague: Colleague, msg: str) -> None:
         if not self.is_colleague(colleague):
             return
 
-        print(f'{colleague.name} disse: {msg}')
+        receivers = [
+            other for other in self._by_name.values() if other is not colleague
+        ]
+        self.last_broadcast = self.fanout.deliver(
+            receivers, f'{colleague.name} disse: {msg}'
+        )
 
     def direct(self, sender: Colleague, receiver: str, msg: str) -> None:
         if not self.is_colleague(sender):
             return
 
-        receiver_obj: list[Colleague] = [
-            colleague for colleague in self.colleagues
-            if colleague.name == receiver
-        ]
+        receiver_obj = self._by_name.get(receiver)
 
-        if not receiver_obj:
+        if receiver_obj is None:
             return
 
-        receiver_obj[0].direct(
-            f'{sender.name} para {receiver_obj[0].name}: {msg}'
+        receiver_obj.direct(
+            f'{sender.name} para {receiver_obj.name}: {msg}'
         )
 
 
@@ -0,0 +1,262 @@
+"""
+Mediator assincrono com asyncio.
+
+Cada colleague possui uma caixa de entrada (asyncio.Queue) limitada e uma
+task consumidora propria. O mediator apenas coloca as mensagens nas caixas
+de entrada, entao um receptor lento nao trava o remetente nem as mensagens
+destinadas aos outros colleagues (sem head-of-line blocking).
+
+Quando a caixa de entrada esta cheia, a politica de descarte decide o que
+acontece:
+- 'block': o remetente espera haver espaco (backpressure);
+- 'drop_new': a mensagem nova e descartada;
+- 'drop_oldest': a mensagem mais antiga da fila e descartada.
+"""
+from __future__ import annotations
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Literal
+
+DropPolicy = Literal['block', 'drop_new', 'drop_oldest']
+
+
+class AsyncColleague(ABC):
+    def __init__(self):
+        self.name: str
+
+    @abstractmethod
+    async def broadcast(self, msg: str) -> None:
+        pass
+
+    @abstractmethod
+    async def direct(self, msg: str) -> None:
+        pass
+
+
+class AsyncPerson(AsyncColleague):
+    def __init__(
+        self,
+        name: str,
+        mediator: AsyncMediator,
+        maxsize: int = 100,
+        drop_policy: DropPolicy = 'block',
+    ) -> None:
+        self.name = name
+        self.mediator = mediator
+        self.drop_policy = drop_policy
+        self.mailbox: asyncio.Queue[str] = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.failed = 0
+        self._consumer: asyncio.Task | None = None
+
+    def start(self) -> None:
+        # Precisa de um event loop rodando
+        if self._consumer is None:
+            self._consumer = asyncio.get_running_loop().create_task(
+                self._consume(), name=f'mailbox-{self.name}'
+            )
+
+    async def stop(self) -> None:
+        # Espera a caixa de entrada esvaziar e encerra o consumidor
+        if self._consumer is None:
+            return
+
+        await self.mailbox.join()
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        self._consumer = None
+
+    def offer(self, msg: str) -> bool:
+        # Entrega sem esperar. Retorna False apenas quando a politica e
+        # 'block' e a caixa de entrada esta cheia.
+        try:
+            self.mailbox.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.drop_policy == 'block':
+            return False
+
+        if self.drop_policy == 'drop_oldest':
+            self.mailbox.get_nowait()
+            self.mailbox.task_done()
+            self.mailbox.put_nowait(msg)
+
+        self.dropped += 1
+        return True
+
+    async def deliver(self, msg: str) -> None:
+        if not self.offer(msg):
+            await self.mailbox.put(msg)
+
+    async def _consume(self) -> None:
+        # Um erro em direct() e reportado e o consumidor segue: se a task
+        # morresse, a caixa de entrada pararia de esvaziar e remetentes
+        # com 'block', stop() e close() esperariam para sempre
+        while True:
+            msg = await self.mailbox.get()
+            try:
+                await self.direct(msg)
+            except Exception as error:
+                self.failed += 1
+                self.on_error(msg, error)
+            finally:
+                self.mailbox.task_done()
+
+    def on_error(self, msg: str, error: Exception) -> None:
+        asyncio.get_running_loop().call_exception_handler({
+            'message': f'Erro ao entregar mensagem para {self.name}',
+            'exception': error,
+            'task': self._consumer,
+        })
+
+    async def broadcast(self, msg: str) -> None:
+        await self.mediator.broadcast(self, msg)
+
+    async def send_direct(self, receiver: str, msg: str) -> None:
+        await self.mediator.direct(self, receiver, msg)
+
+    async def direct(self, msg: str) -> None:
+        print(msg)
+
+
+class AsyncMediator(ABC):
+    @abstractmethod
+    async def broadcast(self, colleague: AsyncColleague, msg: str) -> None:
+        pass
+
+    @abstractmethod
+    async def direct(
+        self, sender: AsyncColleague, receiver: str, msg: str
+    ) -> None:
+        pass
+
+
+class AsyncChatroom(AsyncMediator):
+    # Concrete mediator
+    # Mesmo indice do Chatroom (nomes unicos por sala), mas as entregas
+    # vao para as caixas de entrada de cada AsyncPerson.
+    def __init__(self):
+        self._by_name: dict[str, AsyncPerson] = {}
+        self._members: set[AsyncPerson] = set()
+
+    @property
+    def colleagues(self) -> list[AsyncPerson]:
+        return list(self._by_name.values())
+
+    def is_colleague(self, colleague: AsyncColleague) -> bool:
+        return colleague in self._members
+
+    def add(self, colleague: AsyncPerson) -> None:
+        if self.is_colleague(colleague):
+            return
+
+        if colleague.name in self._by_name:
+            raise ValueError(
+                f'Ja existe um colleague chamado {colleague.name} na sala'
+            )
+
+        self._by_name[colleague.name] = colleague
+        self._members.add(colleague)
+        colleague.start()
+
+    async def remove(self, colleague: AsyncPerson) -> None:
+        if not self.is_colleague(colleague):
+            return
+
+        self._members.discard(colleague)
+        del self._by_name[colleague.name]
+        await colleague.stop()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.stop() for c in self._members))
+
+    async def broadcast(self, colleague: AsyncColleague, msg: str) -> None:
+        if not self.is_colleague(colleague):
+            return
+
+        text = f'{colleague.name} disse: {msg}'
+        # Tenta entregar sem esperar; so espera (em paralelo) pelas caixas
+        # de entrada cheias com politica 'block'.
+        full = [
+            other for other in self._by_name.values()
+            if other is not colleague and not other.offer(text)
+        ]
+
+        if full:
+            await asyncio.gather(*(other.deliver(text) for other in full))
+
+    async def direct(
+        self, sender: AsyncColleague, receiver: str, msg: str
+    ) -> None:
+        if not self.is_colleague(sender):
+            return
+
+        receiver_obj = self._by_name.get(receiver)
+
+        if receiver_obj is None:
+            return
+
+        await receiver_obj.deliver(
+            f'{sender.name} para {receiver_obj.name}: {msg}'
+        )
+
+
+class SlowPerson(AsyncPerson):
+    # Simula um receptor lento
+    async def direct(self, msg: str) -> None:
+        await asyncio.sleep(0.01)
+        print(f'(lento) {self.name} recebeu -> {msg}')
+
+
+class QuietPerson(AsyncPerson):
+    def __init__(self, name: str, mediator: AsyncMediator) -> None:
+        super().__init__(name, mediator)
+        self.received = 0
+
+    async def direct(self, msg: str) -> None:
+        self.received += 1
+
+
+async def main() -> None:
+    chat = AsyncChatroom()
+
+    p1 = AsyncPerson('Joao', chat)
+    p2 = SlowPerson('Helena', chat, maxsize=2, drop_policy='drop_oldest')
+    p3 = AsyncPerson('Edu', chat)
+
+    chat.add(p1)
+    chat.add(p2)
+    chat.add(p3)
+
+    for i in range(5):
+        await p1.broadcast(f'Ola mundo {i}')
+
+    await p3.send_direct('Joao', 'Joao, ta ai?')
+    await chat.close()
+    print('Mensagens descartadas para Helena:', p2.dropped)
+    print()
+
+    # Milhares de salas no mesmo event loop
+    rooms = [AsyncChatroom() for _ in range(2_000)]
+    members: list[QuietPerson] = []
+
+    for number, room in enumerate(rooms):
+        for name in ('a', 'b', 'c'):
+            person = QuietPerson(f'{name}{number}', room)
+            room.add(person)
+            members.append(person)
+
+    await asyncio.gather(*(
+        person.broadcast('oi') for person in members
+    ))
+    await asyncio.gather(*(room.close() for room in rooms))
+    print('Mensagens entregues:', sum(p.received for p in members))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark do roteamento do Chatroom.
+
+Mede o custo medio de is_colleague e direct em salas de 10 ate 1M
+colleagues. Com o indice nome -> colleague o tempo por operacao deve
+permanecer praticamente constante, independente do tamanho da sala.
+
+Tambem mede a latencia e a vazao de um broadcast com fan-out em shards.
+"""
+from __future__ import annotations
+from time import perf_counter
+
+from mediator import BroadcastStats, Chatroom, FanOut, Mediator, Person
+
+
+class QuietPerson(Person):
+    # Nao imprime nada, apenas conta as mensagens recebidas
+    def __init__(self, name: str, mediator: Mediator) -> None:
+        super().__init__(name, mediator)
+        self.received = 0
+
+    def direct(self, msg: str):
+        self.received += 1
+
+
+def bench_room(size: int, operations: int = 100_000) -> tuple[float, float]:
+    chat = Chatroom()
+    people = [QuietPerson(f'p{i}', chat) for i in range(size)]
+
+    for person in people:
+        chat.add(person)
+
+    sender = people[0]
+    # O pior caso da versao antiga: o destinatario e o ultimo da lista
+    receiver = people[-1].name
+
+    start = perf_counter()
+    for _ in range(operations):
+        chat.is_colleague(sender)
+    membership = (perf_counter() - start) / operations
+
+    start = perf_counter()
+    for _ in range(operations):
+        sender.send_direct(receiver, 'oi')
+    direct = (perf_counter() - start) / operations
+
+    return membership, direct
+
+
+def bench_broadcast(size: int, shard_size: int) -> BroadcastStats:
+    chat = Chatroom(FanOut(shard_size))
+    people = [QuietPerson(f'p{i}', chat) for i in range(size)]
+
+    for person in people:
+        chat.add(person)
+
+    people[0].broadcast('oi')
+    chat.fanout.shutdown()
+    assert chat.last_broadcast is not None
+    return chat.last_broadcast
+
+
+if __name__ == '__main__':
+    print(f'{"colleagues":>10} {"is_colleague (ns)":>18} {"direct (ns)":>12}')
+
+    for size in (10, 1_000, 100_000, 1_000_000):
+        membership, direct = bench_room(size)
+        print(f'{size:>10} {membership * 1e9:>18.1f} {direct * 1e9:>12.1f}')
+
+    print()
+    print(f'{"colleagues":>10} {"shards":>7} {"latencia (ms)":>14} '
+          f'{"entregas/s":>12}')
+
+    for size in (1_000, 10_000, 100_000):
+        stats = bench_broadcast(size, shard_size=4096)
+        print(f'{size:>10} {stats.shards:>7} {stats.seconds * 1e3:>14.2f} '
+              f'{stats.throughput:>12.0f}')
@@ -0,0 +1,261 @@
+"""
+Historico de mensagens do Chatroom em um ring buffer memory-mapped.
+
+O historico fica em um arquivo de tamanho fixo, mapeado em memoria, com
+registros prefixados pelo tamanho (4 bytes, little endian). Os offsets sao
+logicos e so crescem; a posicao fisica e offset % capacidade. Quando o
+buffer enche, os registros mais antigos sao descartados.
+
+Um registro nunca e quebrado no fim do arquivo: se nao couber, o restante
+do buffer vira padding e o registro comeca do inicio. Assim toda leitura e
+um memoryview contiguo sobre o mmap (zero-copy). Esses memoryviews apontam
+para o buffer, entao devem ser consumidos antes de novos appends
+sobrescreverem a regiao. close() pode ser chamado com memoryviews ainda
+vivos; eles continuam validos ate serem liberados.
+
+Layout do arquivo: cabecalho com head e tail (2 x uint64) seguido da area
+de dados.
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+from collections import deque
+from typing import Iterator
+
+from mediator import Chatroom, Colleague, FanOut, Person
+
+_HEADER = struct.Struct('<QQ')
+_LENGTH = struct.Struct('<I')
+_PADDING = 0xFFFFFFFF
+
+
+class MessageHistory:
+    def __init__(self, path: str, capacity: int = 1 << 20) -> None:
+        # Um arquivo existente e reaberto com a capacidade com que foi criado
+        size = _HEADER.size + capacity
+
+        if os.path.exists(path) and os.path.getsize(path) > _HEADER.size:
+            size = os.path.getsize(path)
+        else:
+            with open(path, 'wb') as file:
+                file.truncate(size)
+
+        self.capacity = size - _HEADER.size
+        self._file = open(path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._data = memoryview(self._mm)[_HEADER.size:]
+        self.head, self.tail = _HEADER.unpack_from(self._mm, 0)
+        # Offsets dos registros presentes, do mais antigo ao mais novo
+        self._offsets: deque[int] = deque(
+            offset for offset, _ in self._scan(self.tail)
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, payload: bytes) -> int:
+        size = _LENGTH.size + len(payload)
+
+        if size > self.capacity:
+            raise ValueError('Registro maior que o historico')
+
+        position = self.head % self.capacity
+        start = self.head
+
+        if position + size > self.capacity:
+            # Nao cabe ate o fim: o resto vira padding
+            start += self.capacity - position
+
+        self._evict(start, start + size)
+
+        if start != self.head and self.capacity - position >= _LENGTH.size:
+            _LENGTH.pack_into(self._data, position, _PADDING)
+
+        position = start % self.capacity
+        _LENGTH.pack_into(self._data, position, len(payload))
+        self._data[position + _LENGTH.size:position + size] = payload
+
+        self.head = start + size
+        self._offsets.append(start)
+        _HEADER.pack_into(self._mm, 0, self.head, self.tail)
+        return start
+
+    def _evict(self, start: int, end: int) -> None:
+        while end - self.tail > self.capacity:
+            if self.tail >= self.head:
+                # Tudo descartado. Depois do head so ha bytes antigos (o
+                # padding ainda nao foi escrito), entao nao da para seguir
+                # lendo tamanhos: o novo registro passa a ser o mais antigo
+                self.tail = start
+                break
+            self.tail = self._next(self.tail)
+
+        while self._offsets and self._offsets[0] < self.tail:
+            self._offsets.popleft()
+
+    def _next(self, offset: int) -> int:
+        # Offset logo apos o registro (ou padding) que comeca em offset
+        position = offset % self.capacity
+        remaining = self.capacity - position
+
+        if remaining < _LENGTH.size:
+            return offset + remaining
+
+        (length,) = _LENGTH.unpack_from(self._data, position)
+
+        if length == _PADDING:
+            return offset + remaining
+
+        return offset + _LENGTH.size + length
+
+    def _scan(self, offset: int) -> Iterator[tuple[int, memoryview]]:
+        offset = max(offset, self.tail)
+
+        while offset < self.head:
+            position = offset % self.capacity
+            remaining = self.capacity - position
+
+            if remaining >= _LENGTH.size:
+                (length,) = _LENGTH.unpack_from(self._data, position)
+                if length != _PADDING:
+                    start = position + _LENGTH.size
+                    yield offset, self._data[start:start + length]
+                    offset += _LENGTH.size + length
+                    continue
+
+            offset += remaining
+
+    def since(self, offset: int) -> Iterator[tuple[int, memoryview]]:
+        # offset deve ser um valor retornado por append (ou head). Se ja
+        # foi descartado, a leitura comeca no registro mais antigo.
+        return self._scan(offset)
+
+    def last(self, n: int) -> Iterator[tuple[int, memoryview]]:
+        if n <= 0 or not self._offsets:
+            return iter(())
+        return self._scan(self._offsets[-min(n, len(self._offsets))])
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        self._mm.flush()
+        self._data.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # Ainda ha memoryviews de registros vivos: o mmap continua
+            # valido para eles e e fechado quando o ultimo for liberado
+            pass
+        self._file.close()
+
+
+def check_against_model(
+    path: str, capacity: int = 64, appends: int = 2_000, seed: int = 0
+) -> None:
+    # Compara o historico com um modelo simples: uma lista de (offset,
+    # registro) da qual saem os registros que nao cabem mais na janela
+    import random
+
+    rng = random.Random(seed)
+    history = MessageHistory(path, capacity)
+    model: list[tuple[int, bytes]] = []
+    head = 0
+
+    for i in range(appends):
+        payload = bytes([65 + i % 26]) * rng.randint(0, capacity - 4)
+        size = _LENGTH.size + len(payload)
+        start = head
+        if head % capacity + size > capacity:
+            start += capacity - head % capacity
+        head = start + size
+        model = [
+            (offset, record) for offset, record in model
+            if offset >= head - capacity
+        ]
+        model.append((start, payload))
+
+        assert history.append(payload) == start
+        if rng.random() < 0.05:
+            # Reabre a partir do arquivo
+            history.close()
+            history = MessageHistory(path)
+
+        got = [(offset, bytes(record)) for offset, record in history.since(0)]
+        assert got == model, (i, got, model)
+        assert len(history) == len(model)
+
+    history.close()
+
+
+class HistoryChatroom(Chatroom):
+    # Grava os broadcasts no historico e permite reenviar mensagens
+    # antigas para quem entra depois na sala.
+    def __init__(
+        self, history: MessageHistory, fanout: FanOut | None = None
+    ) -> None:
+        super().__init__(fanout)
+        self.history = history
+
+    def add(self, colleague: Colleague, replay: int = 0) -> None:
+        is_new = not self.is_colleague(colleague)
+        super().add(colleague)
+
+        if is_new and replay:
+            self._replay(colleague, self.history.last(replay))
+
+    def replay_since(self, colleague: Colleague, offset: int) -> None:
+        if self.is_colleague(colleague):
+            self._replay(colleague, self.history.since(offset))
+
+    def _replay(
+        self, colleague: Colleague, records: Iterator[tuple[int, memoryview]]
+    ) -> None:
+        for _, record in records:
+            colleague.direct(str(record, 'utf-8'))
+
+    def broadcast(self, colleague: Colleague, msg: str) -> None:
+        if not self.is_colleague(colleague):
+            return
+
+        super().broadcast(colleague, msg)
+        self.history.append(f'{colleague.name} disse: {msg}'.encode())
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for capacity in (40, 64, 257):
+            check_against_model(os.path.join(tmp, f'model_{capacity}'),
+                                capacity)
+        print('Historico igual ao modelo de referencia')
+        print()
+
+        history = MessageHistory(os.path.join(tmp, 'chat.history'), 128)
+        chat = HistoryChatroom(history)
+
+        p1 = Person('Joao', chat)
+        p2 = Person('Helena', chat)
+        p3 = Person('Edu', chat)
+
+        chat.add(p1)
+        chat.add(p2)
+
+        for i in range(6):
+            p1.broadcast(f'mensagem {i}')
+        print()
+
+        # Edu chega atrasado e recebe as ultimas 3 mensagens
+        chat.add(p3, replay=3)
+        print()
+
+        print('Registros no historico:', len(history))
+        print('Offsets:', history.tail, '->', history.head)
+        history.close()
+
+        # O historico sobrevive ao fechamento do arquivo
+        history = MessageHistory(os.path.join(tmp, 'chat.history'))
+        print([str(record, 'utf-8') for _, record in history.since(0)])
+        history.close()
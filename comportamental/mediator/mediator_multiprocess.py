@@ -0,0 +1,403 @@
+"""
+Mediator com salas particionadas entre processos.
+
+Cada sala pertence a um processo worker, escolhido por hashing consistente
+sobre o nome da sala. O estado de roteamento da sala (um Chatroom com os
+membros) vive no worker; o processo principal apenas encaminha add, remove,
+broadcast e direct pelo Pipe do worker dono e entrega localmente as
+mensagens que o worker devolve.
+
+Cada sala e exposta como um Mediator (Room), entao Person continua igual:
+Person('Joao', hub.room('geral')).
+
+Quando o numero de workers muda (resize), apenas as salas cujo dono mudou
+no anel sao migradas.
+
+Os pedidos sao enviados em pipeline: o envio nao espera a resposta, e uma
+thread coletora por worker recebe as respostas (na ordem dos envios) e faz
+as entregas locais. Assim todos os workers trabalham ao mesmo tempo.
+broadcast e direct retornam um Future; flush() espera todos os pedidos em
+andamento.
+
+O PartitionedChatroom pode ser usado por varias threads: os envios de cada
+Pipe sao serializados por um lock, e a tabela de membros e de donos das
+salas por outro. As entregas (Colleague.direct) acontecem em uma thread de
+entregas por worker; mensagens da mesma sala sao entregues em ordem. Um
+direct() pode enviar mensagens pelo hub (responder): quem espera por uma
+entrega (flush, resize, close) nunca segura o lock do hub.
+"""
+from __future__ import annotations
+import os
+import queue
+import threading
+from bisect import bisect
+from collections import deque
+from concurrent.futures import Future, wait
+from hashlib import blake2b
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Any, Iterable
+
+from mediator import Chatroom, Colleague, Mediator, Person
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    # Anel de hashing consistente com varios pontos (replicas) por no
+    def __init__(self, nodes: Iterable[int], replicas: int = 64) -> None:
+        points = sorted(
+            (_hash(f'{node}:{replica}'), node)
+            for node in nodes for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> int:
+        index = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class RemoteColleague(Colleague):
+    # Representa, dentro do worker, um colleague do processo principal.
+    # As mensagens recebidas vao para a outbox e voltam pelo Pipe.
+    def __init__(self, name: str, outbox: list[tuple[str, str]]) -> None:
+        self.name = name
+        self.outbox = outbox
+
+    def broadcast(self, msg: str):
+        # O envio parte sempre do processo principal
+        pass
+
+    def direct(self, msg: str):
+        self.outbox.append((self.name, msg))
+
+
+def _worker(conn: Connection) -> None:
+    rooms: dict[str, Chatroom] = {}
+    outbox: list[tuple[str, str]] = []
+
+    while True:
+        command, room, *args = conn.recv()
+        result: Any = None
+
+        if command == 'stop':
+            break
+
+        if room not in rooms:
+            rooms[room] = Chatroom()
+        chat = rooms[room]
+
+        if command == 'add':
+            chat.add(RemoteColleague(args[0], outbox))
+        elif command == 'remove':
+            member = chat.get(args[0])
+            if member is not None:
+                chat.remove(member)
+        elif command == 'broadcast':
+            sender = chat.get(args[0])
+            if sender is not None:
+                chat.broadcast(sender, args[1])
+        elif command == 'direct':
+            sender = chat.get(args[0])
+            if sender is not None:
+                chat.direct(sender, args[1], args[2])
+        elif command == 'export':
+            result = [member.name for member in rooms.pop(room).colleagues]
+        elif command == 'import':
+            for name in args[0]:
+                chat.add(RemoteColleague(name, outbox))
+
+        conn.send((result, outbox.copy()))
+        outbox.clear()
+
+    conn.close()
+
+
+class _WorkerLink:
+    # Conexao com um worker: envios em pipeline, uma thread que coleta as
+    # respostas e outra que faz as entregas. O Pipe responde na ordem dos
+    # envios, entao cada resposta corresponde ao pedido mais antigo ainda
+    # pendente.
+    #
+    # A coletora nunca bloqueia fora do recv(): ela nao entrega nem toma
+    # locks, so repassa as respostas para a fila de entregas (sem limite).
+    # Assim um direct() que responde (envia de novo pelo hub) pode ficar
+    # esperando um Pipe cheio sem travar a leitura das respostas.
+    def __init__(self, hub: PartitionedChatroom) -> None:
+        self.conn, child = Pipe()
+        self.process = Process(target=_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self._send_lock = threading.Lock()
+        self._pending: deque[tuple[str, Future]] = deque()
+        # Pedidos enviados cujas entregas ainda nao terminaram
+        self._unfinished: set[Future] = set()
+        self._deliveries: queue.SimpleQueue[
+            tuple[str, list[tuple[str, str]], Future] | None
+        ] = queue.SimpleQueue()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._deliverer = threading.Thread(
+            target=self._deliver, args=(hub,), daemon=True
+        )
+        self._collector.start()
+        self._deliverer.start()
+
+    def send(self, message: tuple) -> Future:
+        future: Future = Future()
+        self._unfinished.add(future)
+        future.add_done_callback(self._unfinished.discard)
+        # O pendente entra antes do envio, entao ja esta na fila quando a
+        # resposta chega
+        with self._send_lock:
+            self._pending.append((message[1], future))
+            self.conn.send(message)
+        return future
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                result, deliveries = self.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            room, future = self._pending.popleft()
+            if deliveries:
+                # O resultado so fica pronto depois das entregas
+                self._deliveries.put((room, deliveries, future))
+            else:
+                future.set_result(result)
+
+        while self._pending:
+            _, future = self._pending.popleft()
+            future.set_exception(EOFError('Worker encerrado'))
+        self._deliveries.put(None)
+
+    def _deliver(self, hub: PartitionedChatroom) -> None:
+        while (item := self._deliveries.get()) is not None:
+            room, deliveries, future = item
+            try:
+                hub._deliver(room, deliveries)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._unfinished)
+
+    def flush(self) -> None:
+        wait(list(self._unfinished))
+
+    def stop(self) -> None:
+        with self._send_lock:
+            self.conn.send(('stop', None))
+        # O worker fecha a conexao ao parar; a coletora recebe EOF e
+        # encerra a thread de entregas depois das entregas pendentes
+        self._collector.join()
+        self._deliverer.join()
+        self.conn.close()
+        self.process.join()
+
+
+class PartitionedChatroom:
+    def __init__(self, workers: int | None = None) -> None:
+        self._workers: dict[int, _WorkerLink] = {}
+        self._ring = HashRing([])
+        # Dono atual de cada sala ja criada
+        self._rooms: dict[str, int] = {}
+        # Colleagues locais, por (sala, nome), para entregar as respostas
+        self._members: dict[tuple[str, str], Colleague] = {}
+        # Protege _members, _rooms e a troca de workers (resize/close)
+        self._lock = threading.RLock()
+        self.resize(workers or os.cpu_count() or 1)
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def room(self, name: str) -> Room:
+        return Room(self, name)
+
+    def owner(self, room: str) -> int:
+        with self._lock:
+            if room not in self._rooms:
+                self._rooms[room] = self._ring.node_for(room)
+            return self._rooms[room]
+
+    def resize(self, workers: int) -> None:
+        if workers < 1:
+            raise ValueError('E preciso pelo menos um worker')
+
+        with self._lock:
+            # Nao e preciso esperar os pedidos em andamento: o export vai
+            # pelo mesmo Pipe, depois deles, e os envios para a sala
+            # esperam o lock ate ela estar no novo dono. O export e o
+            # import nao tem entregas, entao nao dependem da thread de
+            # entregas (que pode estar esperando este lock).
+            for node in range(self.workers, workers):
+                self._workers[node] = _WorkerLink(self)
+
+            ring = HashRing(range(workers))
+
+            for room, owner in self._rooms.items():
+                target = ring.node_for(room)
+                if target == owner:
+                    continue
+
+                names = self._request(owner, ('export', room))
+                self._request(target, ('import', room, names))
+                self._rooms[room] = target
+
+            removed = [
+                self._workers.pop(node)
+                for node in range(workers, self.workers)
+            ]
+            self._ring = ring
+
+        # Fora do lock: as entregas pendentes dos workers removidos podem
+        # enviar respostas pelo hub
+        for link in removed:
+            link.stop()
+
+    def flush(self) -> None:
+        # Espera os pedidos ja enviados e suas entregas, inclusive as
+        # respostas enviadas de dentro de direct() nesse meio tempo
+        while True:
+            links = [
+                link for link in list(self._workers.values()) if link.busy
+            ]
+            if not links:
+                return
+            for link in links:
+                link.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            links = list(self._workers.values())
+            self._workers.clear()
+        for link in links:
+            link.stop()
+
+    def __enter__(self) -> PartitionedChatroom:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def is_colleague(self, room: str, colleague: Colleague) -> bool:
+        return self._members.get((room, colleague.name)) is colleague
+
+    def add(self, room: str, colleague: Colleague) -> None:
+        with self._lock:
+            current = self._members.get((room, colleague.name))
+
+            if current is colleague:
+                return
+
+            if current is not None:
+                raise ValueError(
+                    f'Ja existe um colleague chamado {colleague.name} na sala'
+                )
+
+            self._members[(room, colleague.name)] = colleague
+            self._call(room, 'add', colleague.name)
+
+    def remove(self, room: str, colleague: Colleague) -> None:
+        with self._lock:
+            if not self.is_colleague(room, colleague):
+                return
+
+            del self._members[(room, colleague.name)]
+            self._call(room, 'remove', colleague.name)
+
+    def broadcast(
+        self, room: str, colleague: Colleague, msg: str
+    ) -> Future | None:
+        if self.is_colleague(room, colleague):
+            return self._call(room, 'broadcast', colleague.name, msg)
+        return None
+
+    def direct(
+        self, room: str, sender: Colleague, receiver: str, msg: str
+    ) -> Future | None:
+        if self.is_colleague(room, sender):
+            return self._call(room, 'direct', sender.name, receiver, msg)
+        return None
+
+    def _call(self, room: str, command: str, *args: Any) -> Future:
+        # O lock garante que a sala nao troca de worker no meio do envio.
+        # Um envio pode esperar com o lock (Pipe cheio): as coletoras nao
+        # usam o lock, entao o worker sempre consegue esvaziar o Pipe.
+        with self._lock:
+            return self._workers[self.owner(room)].send(
+                (command, room, *args)
+            )
+
+    def _request(self, node: int, message: tuple) -> Any:
+        return self._workers[node].send(message).result()
+
+    def _deliver(self, room: str, deliveries: list[tuple[str, str]]) -> None:
+        # Roda na thread de entregas do worker dono da sala
+        for name, msg in deliveries:
+            member = self._members.get((room, name))
+            if member is not None:
+                member.direct(msg)
+
+
+class Room(Mediator):
+    # Mediator de uma sala especifica do PartitionedChatroom
+    def __init__(self, hub: PartitionedChatroom, name: str) -> None:
+        self.hub = hub
+        self.name = name
+
+    def add(self, colleague: Colleague) -> None:
+        self.hub.add(self.name, colleague)
+
+    def remove(self, colleague: Colleague) -> None:
+        self.hub.remove(self.name, colleague)
+
+    def broadcast(self, colleague: Colleague, msg: str) -> None:
+        self.hub.broadcast(self.name, colleague, msg)
+
+    def direct(self, sender: Colleague, receiver: str, msg: str) -> None:
+        self.hub.direct(self.name, sender, receiver, msg)
+
+
+if __name__ == '__main__':
+    with PartitionedChatroom(workers=4) as hub:
+        rooms = {name: hub.room(name) for name in ('geral', 'python', 'off')}
+
+        people = [
+            Person('Joao', rooms['geral']),
+            Person('Helena', rooms['geral']),
+            Person('Edu', rooms['python']),
+            Person('Carla', rooms['python']),
+            Person('Marcia', rooms['off']),
+            Person('Luiz', rooms['off']),
+        ]
+
+        for person in people:
+            assert isinstance(person.mediator, Room)
+            person.mediator.add(person)
+
+        print({room: hub.owner(room) for room in rooms})
+        people[0].broadcast('Ola mundo')
+        people[2].send_direct('Carla', 'Carla, ta ai?')
+        hub.flush()
+        print()
+
+        hub.resize(2)
+        print({room: hub.owner(room) for room in rooms})
+        people[1].broadcast('Ainda estou aqui')
+        people[4].send_direct('Luiz', 'Mudamos de processo?')
+        hub.flush()
+        print()
+
+        hub.resize(6)
+        print({room: hub.owner(room) for room in rooms})
+        people[3].broadcast('Tudo certo')
@@ -22,39 +22,142 @@ class Memento:
     def get_state(self) -> dict:
         return self._state
 
+    def with_state(self, state: dict) -> Memento:
+        # Memento equivalente com outro estado (usado pelo Caretaker
+        # incremental depois de reconstruir o estado)
+        return Memento(state)
+
     def __setattr__(self, __name: str, __value: Any) -> None:
         raise AttributeError('Sry, im immutable!!')
 
 
+class DeltaMemento(Memento):
+    # Memento incremental: guarda so os atributos alterados desde o
+    # memento anterior e os atributos removidos
+    def __init__(self, changed: dict, removed: frozenset[str]) -> None:
+        super().__init__(changed)
+        self._removed: frozenset[str]
+        object.__setattr__(self, '_removed', removed)
+
+    def get_removed(self) -> frozenset[str]:
+        return self._removed
+
+    def apply_to(self, state: dict) -> None:
+        for key in self._removed:
+            state.pop(key, None)
+        state.update(deepcopy(self._state))
+
+
 class ImageEditor:
+    # _dirty fica em um slot, fora do __dict__, para nao entrar no estado
+    __slots__ = ('__dict__', '_dirty')
+
     def __init__(self, name: str, width: int, height: int) -> None:
+        self._dirty: set[str] = set()
         self.name = name
         self.width = width
         self.height = height
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # Atributos em slots nao fazem parte do estado
+        if name != '__dict__' and name in self.__dict__:
+            self._dirty.add(name)
+
+    def __delattr__(self, name: str) -> None:
+        in_state = name in self.__dict__
+        super().__delattr__(name)
+        if in_state:
+            self._dirty.add(name)
+
+    def mark_dirty(self, name: str) -> None:
+        # Para alteracoes feitas dentro do atributo (ex.: lista.append),
+        # que nao passam pelo __setattr__
+        self._dirty.add(name)
+
     def save_state(self) -> Memento:
+        self._dirty.clear()
         return Memento(deepcopy(self.__dict__))
 
+    def save_delta(self) -> DeltaMemento:
+        changed = {
+            key: deepcopy(self.__dict__[key])
+            for key in self._dirty if key in self.__dict__
+        }
+        removed = frozenset(
+            key for key in self._dirty if key not in self.__dict__
+        )
+        self._dirty.clear()
+        return DeltaMemento(changed, removed)
+
     def restore(self, memento: Memento) -> None:
         self.__dict__ = memento.get_state()
+        self._dirty.clear()
 
     def __str__(self) -> str:
         return f'{type(self).__name__} {self.__dict__}'
 
 
 class Caretaker:
-    def __init__(self, originator: ImageEditor):
+    # Com incremental=True, cada backup guarda so o que mudou desde o
+    # anterior (DeltaMemento) e a cada `keyframe_every` backups guarda um
+    # estado completo (keyframe). O restore reconstroi o estado a partir
+    # do ultimo keyframe aplicando os deltas.
+    def __init__(
+        self,
+        originator: ImageEditor,
+        incremental: bool = False,
+        keyframe_every: int = 16,
+    ):
         self._originator = originator
         self._mementos: list[Memento] = []
+        self.incremental = incremental
+        self.keyframe_every = keyframe_every
+        # Posicao do ultimo keyframe em _mementos
+        self._keyframe = -1
+        self._needs_keyframe = True
 
     def backup(self) -> None:
-        self._mementos.append(self._originator.save_state())
+        if not self.incremental:
+            self._mementos.append(self._originator.save_state())
+            return
+
+        if (
+            self._needs_keyframe
+            or len(self._mementos) - self._keyframe >= self.keyframe_every
+        ):
+            self._needs_keyframe = False
+            self._keyframe = len(self._mementos)
+            self._mementos.append(self._originator.save_state())
+        else:
+            self._mementos.append(self._originator.save_delta())
 
     def restore(self) -> None:
         if not self._mementos:
             return
 
-        self._originator.restore(self._mementos.pop())
+        if not self.incremental:
+            self._originator.restore(self._mementos.pop())
+            return
+
+        state = deepcopy(self._mementos[self._keyframe].get_state())
+        for memento in self._mementos[self._keyframe + 1:]:
+            assert isinstance(memento, DeltaMemento)
+            memento.apply_to(state)
+
+        self._originator.restore(self._mementos.pop().with_state(state))
+
+        # O estado restaurado nao corresponde mais ao fim da lista, entao
+        # o proximo backup precisa ser um keyframe
+        self._needs_keyframe = True
+        self._keyframe = -1
+        for index in range(len(self._mementos) - 1, -1, -1):
+            if self._is_keyframe(index):
+                self._keyframe = index
+                break
+
+    def _is_keyframe(self, index: int) -> bool:
+        return not isinstance(self._mementos[index], DeltaMemento)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+"""
+Benchmark dos mementos completos contra os incrementais.
+
+O ImageEditor recebe um estado grande (camadas com muitos pontos) e, entre
+um backup e outro, so um atributo pequeno muda. Mede a memoria alocada por
+snapshot e o tempo de backup e de restore nos dois modos.
+"""
+from __future__ import annotations
+import tracemalloc
+from time import perf_counter
+
+from memento import Caretaker, ImageEditor
+
+
+def build_editor() -> ImageEditor:
+    img = ImageEditor('FOTO.jpg', 1920, 1080)
+    img.layers = {  # type: ignore[attr-defined]
+        f'layer_{i}': [(x, x * 2) for x in range(200)] for i in range(20)
+    }
+    return img
+
+
+def run_backups(incremental: bool, snapshots: int) -> Caretaker:
+    img = build_editor()
+    caretaker = Caretaker(img, incremental=incremental, keyframe_every=25)
+
+    for i in range(snapshots):
+        img.name = f'FOTO_{i}.jpg'
+        caretaker.backup()
+
+    return caretaker
+
+
+def bench(incremental: bool, snapshots: int = 100) -> None:
+    # Memoria e tempo medidos separadamente: o tracemalloc deixa tudo
+    # bem mais lento
+    tracemalloc.start()
+    caretaker = run_backups(incremental, snapshots)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del caretaker
+
+    start = perf_counter()
+    caretaker = run_backups(incremental, snapshots)
+    backup_time = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(10):
+        caretaker.restore()
+    restore_time = (perf_counter() - start) / 10
+
+    mode = 'incremental' if incremental else 'completo'
+    print(f'{mode:>12}: {memory / snapshots / 1024:10.1f} KiB/snapshot '
+          f'{backup_time / snapshots * 1e3:8.3f} ms/backup '
+          f'{restore_time * 1e3:8.3f} ms/restore')
+
+
+if __name__ == '__main__':
+    bench(incremental=False)
+    bench(incremental=True)
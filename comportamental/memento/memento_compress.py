@@ -0,0 +1,213 @@
+"""
+Compressao em segundo plano dos mementos "frios".
+
+A maioria dos mementos nunca e restaurada. O CompressingCaretaker mantem os
+`keep_recent` mementos mais novos como estao e manda os mais antigos para
+uma thread que os comprime (zlib ou lzma). O memento comprimido continua
+sendo um Memento: get_state() descomprime de forma transparente.
+
+O caretaker informa a taxa de compressao e a latencia das descompressoes,
+para ajustar `keep_recent` contra a latencia do restore.
+"""
+from __future__ import annotations
+import lzma
+import pickle
+import queue
+import threading
+import zlib
+from time import perf_counter
+from typing import Any
+
+from memento import Caretaker, DeltaMemento, ImageEditor, Memento
+
+CODECS: dict[str, Any] = {'zlib': zlib, 'lzma': lzma}
+
+
+def snapshot(memento: Memento) -> bytes:
+    return pickle.dumps(memento, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class CompressedMemento(Memento):
+    def __init__(
+        self, memento: Memento, codec: str = 'zlib', raw: bytes | None = None
+    ) -> None:
+        # `raw` e o snapshot(memento) ja tirado, se houver
+        if raw is None:
+            raw = snapshot(memento)
+        data = CODECS[codec].compress(raw)
+        super().__init__({})
+        self._codec: str
+        self._data: bytes
+        self._keyframe: bool
+        self.raw_size: int
+        self.compressed_size: int
+        self.decompress_seconds: float
+        object.__setattr__(self, '_codec', codec)
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, '_keyframe',
+                           not isinstance(memento, DeltaMemento))
+        object.__setattr__(self, 'raw_size', len(raw))
+        object.__setattr__(self, 'compressed_size', len(data))
+        object.__setattr__(self, 'decompress_seconds', 0.0)
+
+    def is_keyframe(self) -> bool:
+        return self._keyframe
+
+    def unwrap(self) -> Memento:
+        start = perf_counter()
+        codec = CODECS[self._codec]
+        memento = pickle.loads(codec.decompress(self._data))
+        object.__setattr__(self, 'decompress_seconds',
+                           perf_counter() - start)
+        return memento
+
+    def get_state(self) -> dict:
+        return self.unwrap().get_state()
+
+    def with_state(self, state: dict) -> Memento:
+        return self.unwrap().with_state(state)
+
+
+class CompressingCaretaker(Caretaker):
+    def __init__(
+        self,
+        originator: ImageEditor,
+        keep_recent: int = 4,
+        codec: str = 'zlib',
+        incremental: bool = False,
+        keyframe_every: int = 16,
+    ) -> None:
+        if codec not in CODECS:
+            raise ValueError(f'Codec desconhecido: {codec}')
+
+        super().__init__(originator, incremental, keyframe_every)
+        self.keep_recent = keep_recent
+        self.codec = codec
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.decompressions = 0
+        self.decompress_seconds = 0.0
+        # Mementos que falharam ao comprimir (ficam sem comprimir)
+        self.failures = 0
+        # Protege _mementos entre a thread principal e a de compressao
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[tuple[int, Memento] | None] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    @property
+    def ratio(self) -> float:
+        if not self.compressed_bytes:
+            return 0.0
+        return self.raw_bytes / self.compressed_bytes
+
+    @property
+    def mean_decompress_seconds(self) -> float:
+        if not self.decompressions:
+            return 0.0
+        return self.decompress_seconds / self.decompressions
+
+    def backup(self) -> None:
+        with self._lock:
+            super().backup()
+            cold = len(self._mementos) - self.keep_recent - 1
+
+            if cold >= 0:
+                self._queue.put((cold, self._mementos[cold]))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+
+                self._compress(*item)
+            except Exception:
+                # Um memento que nao comprime fica como esta; a thread
+                # segue viva para que wait() e close() nao travem
+                self.failures += 1
+            finally:
+                self._queue.task_done()
+
+    def _is_current(self, index: int, memento: Memento) -> bool:
+        # O memento pode ter sido restaurado depois de enfileirado
+        return (
+            index < len(self._mementos) and self._mementos[index] is memento
+        )
+
+    def _compress(self, index: int, memento: Memento) -> None:
+        if isinstance(memento, CompressedMemento):
+            return
+
+        # O snapshot e tirado com o lock: um memento restaurado sai da
+        # lista, e o ImageEditor pode passar a usar o dict dele como
+        # __dict__. A compressao, que e a parte cara, fica fora do lock.
+        with self._lock:
+            if not self._is_current(index, memento):
+                return
+            raw = snapshot(memento)
+
+        compressed = CompressedMemento(memento, self.codec, raw)
+
+        with self._lock:
+            if self._is_current(index, memento):
+                self._mementos[index] = compressed
+                self.raw_bytes += compressed.raw_size
+                self.compressed_bytes += compressed.compressed_size
+
+    def _is_keyframe(self, index: int) -> bool:
+        memento = self._mementos[index]
+        if isinstance(memento, CompressedMemento):
+            return memento.is_keyframe()
+        return super()._is_keyframe(index)
+
+    def restore(self) -> None:
+        with self._lock:
+            if not self._mementos:
+                return
+
+            # Descomprime o que o restore vai ler
+            first = len(self._mementos) - 1
+            if self.incremental:
+                first = max(self._keyframe, 0)
+
+            for index in range(first, len(self._mementos)):
+                memento = self._mementos[index]
+                if isinstance(memento, CompressedMemento):
+                    self._mementos[index] = memento.unwrap()
+                    self.decompressions += 1
+                    self.decompress_seconds += memento.decompress_seconds
+
+            super().restore()
+
+    def wait(self) -> None:
+        # Espera a thread comprimir tudo o que ja foi enfileirado
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+
+
+if __name__ == '__main__':
+    for codec in CODECS:
+        img = ImageEditor('FOTO_1.jpg', 111, 111)
+        history = [f'pincelada {i}' for i in range(5_000)]
+        img.history = history  # type: ignore[attr-defined]
+        caretaker = CompressingCaretaker(img, keep_recent=2, codec=codec)
+
+        for i in range(10):
+            img.name = f'FOTO_{i}.jpg'
+            history.append(f'pincelada extra {i}')
+            caretaker.backup()
+
+        caretaker.wait()
+        for _ in range(10):
+            caretaker.restore()
+
+        print(f'{codec}: taxa {caretaker.ratio:.1f}x, '
+              f'descompressao media '
+              f'{caretaker.mean_decompress_seconds * 1e3:.2f} ms, '
+              f'estado final: {img.name}')
+        caretaker.close()
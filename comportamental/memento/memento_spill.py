@@ -0,0 +1,267 @@
+"""
+Caretaker com orcamento de memoria e mementos despejados em disco.
+
+Cada memento e medido com pickle protocolo 5: os dados "pequenos" vao no
+stream do pickle e os buffers grandes (arrays NumPy, por exemplo) saem
+fora de banda. Buffers compartilhados entre mementos (como os tiles do
+TiledImageEditor) sao contados uma unica vez.
+
+Quando a memoria residente passa de `max_bytes`, os mementos mais antigos
+sao gravados no arquivo de spill (o pickle seguido dos buffers brutos) e
+trocados por um SpilledMemento. Cada buffer vai para o arquivo uma vez so:
+um buffer que ja foi gravado por um spill anterior (o mesmo objeto, ainda
+vivo) e apenas referenciado pela sua posicao no arquivo. No restore, o
+memento e carregado sob demanda: o arquivo e mapeado em memoria e os
+buffers fora de banda viram memoryviews sobre o mmap, sem copia.
+
+O arquivo de spill so cresce; ele e removido no close().
+"""
+from __future__ import annotations
+import mmap
+import os
+import pickle
+import weakref
+from time import perf_counter
+
+from memento import Caretaker, DeltaMemento, ImageEditor, Memento
+
+
+class SpilledMemento:
+    # Lugar de um memento que foi gravado no arquivo de spill
+    def __init__(
+        self,
+        offset: int,
+        data_size: int,
+        buffers: list[tuple[int, int]],
+        written: int,
+        keyframe: bool,
+    ) -> None:
+        self.offset = offset
+        self.data_size = data_size
+        # (posicao, tamanho) de cada buffer; buffers compartilhados podem
+        # estar em trechos gravados por outros spills
+        self.buffers = buffers
+        # Bytes que este spill acrescentou ao arquivo
+        self.nbytes = written
+        self.keyframe = keyframe
+
+    @property
+    def end(self) -> int:
+        return max(
+            [self.offset + self.data_size]
+            + [offset + size for offset, size in self.buffers]
+        )
+
+
+class BudgetCaretaker(Caretaker):
+    def __init__(
+        self,
+        originator: ImageEditor,
+        max_bytes: int,
+        spill_path: str,
+        incremental: bool = False,
+        keyframe_every: int = 16,
+    ) -> None:
+        super().__init__(originator, incremental, keyframe_every)
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self._spill = open(spill_path, 'w+b')
+        self._mm: mmap.mmap | None = None
+        # Para cada memento residente: bytes do pickle e ids dos buffers
+        self._sizes: list[tuple[int, list[int]]] = []
+        # Buffers residentes: id -> [objeto, bytes, quantos mementos usam]
+        self._buffers: dict[int, list] = {}
+        # Buffers ja gravados: (id, bytes) -> (weakref do objeto, posicao)
+        self._on_disk: dict[tuple[int, int], tuple[weakref.ref, int]] = {}
+        self._data_bytes = 0
+        self._buffer_bytes = 0
+        # Os mementos antes desta posicao estao no arquivo de spill
+        self._first_resident = 0
+        self.spills = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._data_bytes + self._buffer_bytes
+
+    @property
+    def spilled_bytes(self) -> int:
+        return sum(
+            memento.nbytes for memento in self._mementos
+            if isinstance(memento, SpilledMemento)
+        )
+
+    @staticmethod
+    def _dump(memento: Memento) -> tuple[bytes, list[pickle.PickleBuffer]]:
+        buffers: list[pickle.PickleBuffer] = []
+        data = pickle.dumps(
+            memento, protocol=5, buffer_callback=buffers.append
+        )
+        return data, buffers
+
+    def _account(self, memento: Memento) -> tuple[int, list[int]]:
+        data, buffers = self._dump(memento)
+        ids = []
+
+        for buffer in buffers:
+            raw = buffer.raw()
+            key = id(raw.obj)
+            entry = self._buffers.get(key)
+            if entry is None:
+                self._buffers[key] = [raw.obj, raw.nbytes, 1]
+                self._buffer_bytes += raw.nbytes
+            else:
+                entry[2] += 1
+            ids.append(key)
+
+        self._data_bytes += len(data)
+        return len(data), ids
+
+    def _unaccount(self, size: tuple[int, list[int]]) -> None:
+        data_size, ids = size
+        self._data_bytes -= data_size
+
+        for key in ids:
+            entry = self._buffers[key]
+            entry[2] -= 1
+            if not entry[2]:
+                self._buffer_bytes -= entry[1]
+                del self._buffers[key]
+
+    def backup(self) -> None:
+        super().backup()
+        self._sizes.append(self._account(self._mementos[-1]))
+
+        # Sempre mantem o memento mais recente em memoria
+        while (
+            self.resident_bytes > self.max_bytes
+            and self._first_resident < len(self._mementos) - 1
+        ):
+            self._spill_out(self._first_resident)
+            self._first_resident += 1
+
+    def _spill_out(self, index: int) -> None:
+        memento = self._mementos[index]
+        assert isinstance(memento, Memento)
+        data, buffers = self._dump(memento)
+
+        self._spill.seek(0, os.SEEK_END)
+        offset = self._spill.tell()
+        self._spill.write(data)
+        position = offset + len(data)
+        places = []
+
+        for buffer in buffers:
+            raw = buffer.raw()
+            key = (id(raw.obj), raw.nbytes)
+            entry = self._on_disk.get(key)
+
+            # O weakref confirma que o id nao foi reaproveitado
+            if entry is not None and entry[0]() is raw.obj:
+                places.append((entry[1], raw.nbytes))
+                continue
+
+            self._spill.write(raw)
+            places.append((position, raw.nbytes))
+            try:
+                self._on_disk[key] = (weakref.ref(raw.obj), position)
+            except TypeError:
+                # Objeto sem suporte a weakref: sera gravado de novo
+                pass
+            position += raw.nbytes
+
+        self._spill.flush()
+
+        self._mementos[index] = SpilledMemento(  # type: ignore[call-overload]
+            offset, len(data), places, position - offset,
+            not isinstance(memento, DeltaMemento),
+        )
+        self._unaccount(self._sizes.pop(0))
+        self.spills += 1
+
+    def _load(self, spilled: SpilledMemento) -> Memento:
+        start = perf_counter()
+        if self._mm is None or len(self._mm) < spilled.end:
+            # Um mmap antigo continua vivo enquanto houver views dele
+            self._mm = mmap.mmap(self._spill.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mm)
+        buffers = [
+            view[offset:offset + size] for offset, size in spilled.buffers
+        ]
+
+        data = view[spilled.offset:spilled.offset + spilled.data_size]
+        memento = pickle.loads(data, buffers=buffers)
+        data.release()
+
+        self.loads += 1
+        self.load_seconds += perf_counter() - start
+        return memento
+
+    def _is_keyframe(self, index: int) -> bool:
+        memento = self._mementos[index]
+        if isinstance(memento, SpilledMemento):
+            return memento.keyframe
+        return super()._is_keyframe(index)
+
+    def restore(self) -> None:
+        if not self._mementos:
+            return
+
+        # Carrega o que o restore vai ler: o ultimo memento ou, no modo
+        # incremental, tudo desde o ultimo keyframe
+        first = len(self._mementos) - 1
+        if self.incremental:
+            first = max(self._keyframe, 0)
+
+        loaded = []
+        for index in range(first, self._first_resident):
+            spilled = self._mementos[index]
+            assert isinstance(spilled, SpilledMemento)
+            memento = self._load(spilled)
+            self._mementos[index] = memento
+            loaded.append(self._account(memento))
+
+        if loaded:
+            self._sizes[:0] = loaded
+            self._first_resident = first
+
+        self._unaccount(self._sizes.pop())
+        super().restore()
+
+    def close(self) -> None:
+        self._spill.close()
+        os.remove(self.spill_path)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    from memento_tiles import TiledImageEditor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        img = TiledImageEditor('FOTO_4K.png', 3840, 2160)
+        caretaker = BudgetCaretaker(
+            img, max_bytes=64 * 2**20, spill_path=os.path.join(tmp, 'spill')
+        )
+
+        for stroke in range(12):
+            # Cada pincelada altera uma faixa larga da imagem
+            img.fill(stroke * 150, 0, 150, 3840, (stroke * 20, 0, 0))
+            img.name = f'FOTO_4K_{stroke}.png'
+            caretaker.backup()
+
+        print(f'Residente: {caretaker.resident_bytes / 2**20:.1f} MiB, '
+              f'em disco: {caretaker.spilled_bytes / 2**20:.1f} MiB, '
+              f'spills: {caretaker.spills}')
+
+        for _ in range(12):
+            caretaker.restore()
+
+        print(img.name, img.region(0, 0, 1, 1).tolist())
+        print(f'Mementos carregados do disco: {caretaker.loads} '
+              f'({caretaker.load_seconds * 1e3:.2f} ms)')
+        del img
+        caretaker.close()
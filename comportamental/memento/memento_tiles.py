@@ -0,0 +1,203 @@
+"""
+ImageEditor com pixels de verdade, guardados em tiles NumPy.
+
+A imagem e dividida em tiles de tamanho fixo. Os mementos guardam uma
+tupla com referencias para os tiles:
+- tiles que nao mudaram desde o ultimo backup sao compartilhados com o
+  memento anterior (nenhuma copia);
+- tiles alterados sao entregues ao memento e ficam somente leitura.
+
+A copia acontece na escrita (copy-on-write): ao pintar um tile que esta
+compartilhado com algum memento, o editor copia apenas aquele tile. Assim
+cada backup custa so os tiles alterados desde o anterior, e o historico de
+uma imagem 8K fica em um orcamento de memoria previsivel.
+"""
+from __future__ import annotations
+from typing import Iterable
+
+import numpy as np
+
+from memento import Caretaker, DeltaMemento, ImageEditor, Memento
+
+
+class TileMemento(Memento):
+    def __init__(self, state: dict, tiles: tuple[np.ndarray, ...]) -> None:
+        super().__init__(state)
+        self._tiles: tuple[np.ndarray, ...]
+        object.__setattr__(self, '_tiles', tiles)
+
+    def get_tiles(self) -> tuple[np.ndarray, ...]:
+        return self._tiles
+
+    def with_state(self, state: dict) -> Memento:
+        return TileMemento(state, self._tiles)
+
+
+class TileDeltaMemento(DeltaMemento):
+    def __init__(
+        self,
+        changed: dict,
+        removed: frozenset[str],
+        tiles: tuple[np.ndarray, ...],
+    ) -> None:
+        super().__init__(changed, removed)
+        self._tiles: tuple[np.ndarray, ...]
+        object.__setattr__(self, '_tiles', tiles)
+
+    def get_tiles(self) -> tuple[np.ndarray, ...]:
+        return self._tiles
+
+    def with_state(self, state: dict) -> Memento:
+        return TileMemento(state, self._tiles)
+
+
+class TiledImageEditor(ImageEditor):
+    # Os tiles ficam em slots, fora do __dict__, entao nao passam pelo
+    # deepcopy do save_state
+    __slots__ = ('tile_size', '_rows', '_cols', '_tiles', '_owned')
+
+    def __init__(
+        self,
+        name: str,
+        width: int,
+        height: int,
+        channels: int = 3,
+        tile_size: int = 256,
+        dtype: type = np.uint8,
+    ) -> None:
+        super().__init__(name, width, height)
+        self.tile_size = tile_size
+        self._rows = -(-height // tile_size)
+        self._cols = -(-width // tile_size)
+        self._tiles: list[np.ndarray] = []
+
+        for row in range(self._rows):
+            for col in range(self._cols):
+                tile_h = min(tile_size, height - row * tile_size)
+                tile_w = min(tile_size, width - col * tile_size)
+                self._tiles.append(
+                    np.zeros((tile_h, tile_w, channels), dtype=dtype)
+                )
+
+        # Tiles que pertencem so ao editor (podem ser escritos sem copia)
+        self._owned = set(range(len(self._tiles)))
+
+    def _tile_ranges(
+        self, y: int, x: int, h: int, w: int
+    ) -> Iterable[tuple[int, slice, slice, slice, slice]]:
+        # (indice, linhas no tile, colunas no tile, linhas, colunas na area)
+        # A area e recortada a imagem: sem o recorte, colunas alem da borda
+        # direita cairiam nos tiles da linha de baixo
+        size = self.tile_size
+        first_y, first_x = max(y, 0), max(x, 0)
+        end_y, end_x = min(y + h, self.height), min(x + w, self.width)
+
+        if end_y <= first_y or end_x <= first_x:
+            return
+
+        for row in range(first_y // size, -(-end_y // size)):
+            for col in range(first_x // size, -(-end_x // size)):
+                top, left = row * size, col * size
+                y0, y1 = max(first_y, top), min(end_y, top + size)
+                x0, x1 = max(first_x, left), min(end_x, left + size)
+                yield (
+                    row * self._cols + col,
+                    slice(y0 - top, y1 - top), slice(x0 - left, x1 - left),
+                    slice(y0 - y, y1 - y), slice(x0 - x, x1 - x),
+                )
+
+    def _writable(self, index: int) -> np.ndarray:
+        if index not in self._owned:
+            self._tiles[index] = self._tiles[index].copy()
+            self._owned.add(index)
+        return self._tiles[index]
+
+    # paint e fill ignoram a parte da area fora da imagem
+
+    def paint(self, y: int, x: int, patch: np.ndarray) -> None:
+        h, w = patch.shape[:2]
+        for index, ty, tx, py, px in self._tile_ranges(y, x, h, w):
+            self._writable(index)[ty, tx] = patch[py, px]
+
+    def fill(self, y: int, x: int, h: int, w: int, color) -> None:
+        for index, ty, tx, _, _ in self._tile_ranges(y, x, h, w):
+            self._writable(index)[ty, tx] = color
+
+    def region(self, y: int, x: int, h: int, w: int) -> np.ndarray:
+        if (
+            y < 0 or x < 0 or h < 0 or w < 0
+            or y + h > self.height or x + w > self.width
+        ):
+            raise ValueError('Regiao fora da imagem')
+
+        first = self._tiles[0]
+        out = np.empty((h, w, first.shape[2]), dtype=first.dtype)
+        for index, ty, tx, py, px in self._tile_ranges(y, x, h, w):
+            out[py, px] = self._tiles[index][ty, tx]
+        return out
+
+    @property
+    def pixels(self) -> np.ndarray:
+        return self.region(0, 0, self.height, self.width)
+
+    def _share_tiles(self) -> tuple[np.ndarray, ...]:
+        # Entrega os tiles alterados ao memento, como somente leitura
+        for index in self._owned:
+            self._tiles[index].flags.writeable = False
+        self._owned.clear()
+        return tuple(self._tiles)
+
+    def save_state(self) -> Memento:
+        memento = super().save_state()
+        return TileMemento(memento.get_state(), self._share_tiles())
+
+    def save_delta(self) -> DeltaMemento:
+        delta = super().save_delta()
+        return TileDeltaMemento(
+            delta.get_state(), delta.get_removed(), self._share_tiles()
+        )
+
+    def restore(self, memento: Memento) -> None:
+        super().restore(memento)
+        if isinstance(memento, (TileMemento, TileDeltaMemento)):
+            self._tiles = list(memento.get_tiles())
+            self._owned.clear()
+
+    def __str__(self) -> str:
+        return (f'{type(self).__name__} {self.__dict__} '
+                f'{len(self._tiles)} tiles')
+
+
+def history_bytes(mementos: Iterable[Memento]) -> int:
+    # Bytes de pixels do historico, contando uma vez cada tile compartilhado
+    seen: dict[int, int] = {}
+    for memento in mementos:
+        if isinstance(memento, (TileMemento, TileDeltaMemento)):
+            for tile in memento.get_tiles():
+                seen[id(tile)] = tile.nbytes
+    return sum(seen.values())
+
+
+if __name__ == '__main__':
+    # Imagem 8K (7680x4320, RGB)
+    img = TiledImageEditor('FOTO_8K.png', 7680, 4320)
+    caretaker = Caretaker(img)
+    caretaker.backup()
+
+    for stroke in range(10):
+        img.fill(100 + stroke * 50, 100 + stroke * 50, 64, 400, (255, 0, 0))
+        img.name = f'FOTO_8K_{stroke}.png'
+        caretaker.backup()
+
+    full = img.pixels.nbytes
+    used = history_bytes(caretaker._mementos)
+    print(img)
+    print(f'Imagem: {full / 2**20:.1f} MiB')
+    print(f'Historico com 11 backups: {used / 2**20:.1f} MiB '
+          f'(copias completas: {11 * full / 2**20:.1f} MiB)')
+
+    before = img.region(600, 900, 1, 1).tolist()
+    caretaker.restore()
+    caretaker.restore()
+    caretaker.restore()
+    print(before, '->', img.region(600, 900, 1, 1).tolist(), img.name)
@@ -11,6 +11,9 @@ que gera as informações.
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from typing import Iterable
+
+_MISSING = object()
 
 
 class IObservable(ABC):
@@ -20,48 +23,105 @@ class IObservable(ABC):
     def state(self): pass
 
     @abstractmethod
-    def add_observer(self, observer: IObserver) -> None: pass
+    def add_observer(
+        self, observer: IObserver, keys: Iterable[str] | None = None
+    ) -> None: pass
 
     @abstractmethod
     def remove_observer(self, observer: IObserver) -> None: pass
 
     @abstractmethod
-    def notify_observers(self) -> None: pass
+    def notify_observers(self, changed: set[str] | None = None) -> None:
+        pass
 
 
 class WeatherStation(IObservable):
     # Observable
     def __init__(self):
+        # Observers de todas as chaves
         self._observers: list[IObserver] = []
+        # Indice chave -> observers daquela chave (dict como set ordenado)
+        self._by_key: dict[str, dict[IObserver, None]] = {}
+        self._keys_of: dict[IObserver, set[str]] = {}
         self._state: dict = {}
 
     @property
     def state(self):
+        # O dict vivo do estado: ele muda nas proximas atualizacoes. Quem
+        # precisa de uma foto do estado deve copia-lo (dict(state)).
         return self._state
 
     @state.setter
     def state(self, state_update: dict):
-        new_state: dict = {**self._state, **state_update}
+        # Compara so as chaves recebidas; se nada mudou, nada e alocado
+        current = self._state
+        changed: set[str] | None = None
+
+        for key, value in state_update.items():
+            if current.get(key, _MISSING) != value:
+                if changed is None:
+                    changed = set()
+                changed.add(key)
+                # Escreve ja no loop para manter a ordem das chaves novas
+                current[key] = value
 
-        if new_state != self._state:
-            self._state = new_state
-            self.notify_observers()
+        if changed is not None:
+            self.notify_observers(changed)
 
     def reset_state(self):
         self._state = {}
         self.notify_observers()
 
-    def add_observer(self, observer: IObserver) -> None:
-        self._observers.append(observer)
+    def add_observer(
+        self, observer: IObserver, keys: Iterable[str] | None = None
+    ) -> None:
+        # Sem `keys`, o observer recebe todas as mudancas. Um observer fica
+        # em um so dos lados: ou em _observers, ou no indice por chave
+        if keys is None:
+            self._unsubscribe_keys(observer)
+            self._observers.append(observer)
+            return
+
+        if observer in self._observers:
+            return
+
+        subscribed = self._keys_of.setdefault(observer, set())
+        for key in keys:
+            self._by_key.setdefault(key, {})[observer] = None
+            subscribed.add(key)
 
     def remove_observer(self, observer: IObserver) -> None:
         if observer in self._observers:
             self._observers.remove(observer)
-
-    def notify_observers(self) -> None:
+        self._unsubscribe_keys(observer)
+
+    def _unsubscribe_keys(self, observer: IObserver) -> None:
+        for key in self._keys_of.pop(observer, ()):
+            observers = self._by_key[key]
+            del observers[observer]
+            if not observers:
+                del self._by_key[key]
+
+    def notify_observers(self, changed: set[str] | None = None) -> None:
+        # `changed` sao as chaves alteradas (None: o estado todo). Primeiro
+        # os observers de todas as chaves, depois os das chaves alteradas,
+        # cada um uma unica vez
         for observer in self._observers:
             observer.update()
 
+        if not self._by_key:
+            return
+
+        keys = self._by_key.keys() if changed is None else changed
+        targets: dict[IObserver, None] = {}
+        for key in keys:
+            observers = self._by_key.get(key)
+            if observers:
+                targets.update(observers)
+
+        for observer in targets:
+            observer.update()
+
 
 class IObserver(ABC):
     @abstractmethod
@@ -102,10 +162,12 @@ if __name__ == '__main__':
 
     weather_station.add_observer(smartphone)
     weather_station.add_observer(outro_smartphone)
-    weather_station.add_observer(notebook)
+    # O notebook so quer saber da temperatura
+    weather_station.add_observer(notebook, keys=['temperatura'])
 
     weather_station.state = {'temperatura': '30'}
     weather_station.state = {'temperatura': '32'}
+    weather_station.state = {'umidade': '90'}
 
     weather_station.remove_observer(outro_smartphone)
     weather_station.reset_state()
@@ -0,0 +1,88 @@
+"""
+Lote colunar de pedidos com transicoes vetorizadas.
+
+O OrderBatch guarda o estado de cada pedido como um codigo int8 em um
+array NumPy (os codigos sao os de OrderMachine.states). Um array de
+eventos (PENDING, APPROVE, REJECT) e aplicado ao lote inteiro de uma vez,
+com a mesma tabela de transicoes compilada das classes originais.
+
+apply() retorna uma mascara com as transicoes recusadas: aquelas em que
+o estado original so imprime "Nao posso..." e nao muda.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from state_table import DEFAULT_MACHINE, EVENTS, OrderMachine, TableOrder
+
+
+class OrderBatch:
+    def __init__(
+        self, size: int, machine: OrderMachine = DEFAULT_MACHINE
+    ) -> None:
+        self.machine = machine
+        self.states = np.full(size, machine.initial.code, dtype=np.int8)
+        # Tabelas achatadas: chave estado * len(EVENTS) + evento ->
+        # proximo estado / transicao recusada
+        self._next = np.array(
+            [
+                machine.next_state(state, event).code
+                for state in machine.states
+                for event in range(len(EVENTS))
+            ],
+            dtype=np.int8,
+        )
+        self._refused = self._next == np.repeat(
+            np.arange(len(machine.states), dtype=np.int8), len(EVENTS)
+        )
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def apply(
+        self, events: np.ndarray | int, index: np.ndarray | None = None
+    ) -> np.ndarray:
+        # `events` tem um evento por pedido (ou um evento para todos);
+        # com `index`, so os pedidos indicados recebem eventos
+        events = np.asarray(events, dtype=np.int8)
+        if events.size and (events.min() < 0 or events.max() >= len(EVENTS)):
+            raise ValueError('Evento desconhecido no lote')
+
+        current = self.states if index is None else self.states[index]
+        keys = current * np.int8(len(EVENTS)) + events
+        refused = np.take(self._refused, keys)
+
+        if index is None:
+            self.states = np.take(self._next, keys)
+        else:
+            self.states[index] = np.take(self._next, keys)
+
+        return refused
+
+    def state_of(self, position: int) -> str:
+        return self.machine.states[self.states[position]].name
+
+    def counts(self) -> dict[str, int]:
+        counts = np.bincount(self.states, minlength=len(self.machine.states))
+        return {
+            state.name: int(count)
+            for state, count in zip(self.machine.states, counts)
+        }
+
+    def order(self, position: int) -> TableOrder:
+        # Copia de um pedido do lote como objeto
+        order = TableOrder(self.machine)
+        order.state = self.machine.states[self.states[position]]
+        return order
+
+
+if __name__ == '__main__':
+    from state_table import APPROVE, PENDING, REJECT
+
+    batch = OrderBatch(6)
+    print(batch.apply(np.array([PENDING, APPROVE, APPROVE,
+                                REJECT, APPROVE, PENDING])))
+    print(batch.apply(APPROVE))
+    print(batch.apply(np.array([REJECT, PENDING]), index=np.array([1, 3])))
+    print([batch.state_of(i) for i in range(len(batch))])
+    print(batch.counts())
@@ -0,0 +1,116 @@
+"""
+Transicoes de pedidos seguras entre threads, com lock striping.
+
+Em OrderMachine.fire() a transicao e ler o estado, buscar o proximo e
+escrever: um read-modify-write sem sincronizacao. Duas threads aprovando e
+recusando o mesmo pedido podem se atropelar.
+
+A ConcurrentOrderMachine protege cada transicao com um lock de uma tabela
+de locks listrada: o pedido e mapeado para uma das `stripes` listras pela
+sua chave. Nao ha um lock por pedido (milhoes de locks) nem um lock
+global (todas as threads em fila). compare_and_fire() so aplica o evento
+se o pedido ainda estiver no estado esperado (compare-and-set).
+
+Os hooks sao chamados fora do lock, para que um hook possa disparar
+transicoes em outros pedidos sem risco de deadlock.
+"""
+from __future__ import annotations
+import threading
+from typing import Callable, Hashable, Iterable
+
+from state import OrderState
+from state_table import (EVENTS, ORDER_STATES, OrderMachine, TableOrder,
+                         TableState)
+
+
+def order_key(order: object) -> Hashable:
+    # O proprio pedido: TableOrder tem hash por identidade e StoredOrder
+    # por (store, linha), entao dois StoredOrder do mesmo pedido caem na
+    # mesma listra
+    return order
+
+
+class StripedLocks:
+    def __init__(self, stripes: int = 1024) -> None:
+        if stripes < 1:
+            raise ValueError('E preciso ao menos uma listra')
+
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key: Hashable) -> threading.Lock:
+        return self._locks[hash(key) % self.stripes]
+
+
+class ConcurrentOrderMachine(OrderMachine):
+    def __init__(
+        self,
+        state_classes: Iterable[type[OrderState]] = ORDER_STATES,
+        stripes: int = 1024,
+        key: Callable[[TableOrder], Hashable] = order_key,
+    ) -> None:
+        super().__init__(state_classes)
+        self.locks = StripedLocks(stripes)
+        self.key = key
+
+    def _notify(
+        self, order: TableOrder, event: int,
+        old: TableState, new: TableState, message: str,
+    ) -> None:
+        for hook in self.hooks:
+            hook(order, EVENTS[event], old, new, message)
+
+    def fire(self, order: TableOrder, event: int) -> bool:
+        with self.locks.lock_for(self.key(order)):
+            old = order.state
+            new, message = self._table[old.code][event]
+            order.state = new
+
+        self._notify(order, event, old, new, message)
+        return new is not old
+
+    def compare_and_fire(
+        self, order: TableOrder, expected: TableState, event: int
+    ) -> bool:
+        # Aplica o evento so se o estado atual for `expected`; retorna se
+        # o estado mudou
+        with self.locks.lock_for(self.key(order)):
+            old = order.state
+            if old is not expected:
+                return False
+            new, message = self._table[old.code][event]
+            order.state = new
+
+        self._notify(order, event, old, new, message)
+        return new is not old
+
+
+if __name__ == '__main__':
+    from state_table import APPROVE, REJECT
+
+    machine = ConcurrentOrderMachine(stripes=64)
+    pending, approved, rejected = machine.states
+    orders = [TableOrder(machine) for _ in range(10_000)]
+    results: list[tuple[int, int]] = []
+
+    def worker(event: int) -> None:
+        # Metade das threads aprova, metade recusa: so uma vence por pedido
+        wins = sum(
+            machine.compare_and_fire(order, pending, event)
+            for order in orders
+        )
+        results.append((event, wins))
+
+    threads = [
+        threading.Thread(target=worker, args=(APPROVE if i % 2 else REJECT,))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = sum(wins for _, wins in results)
+    print(f'Transicoes vencedoras: {total} (pedidos: {len(orders)})')
+    print('Aprovados:', sum(order.state is approved for order in orders),
+          'Recusados:', sum(order.state is rejected for order in orders))
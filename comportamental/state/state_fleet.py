@@ -0,0 +1,166 @@
+"""
+Simulacao em massa de frotas de aparelhos Sound (state_2.py).
+
+Cada Sound muda um inteiro `playing` por botao apertado e imprime a cada
+chamada. O SoundFleet guarda `playing` e o modo de N aparelhos em arrays
+NumPy e aplica os eventos a frota inteira de uma vez, com a mesma
+semantica das classes de modo:
+- press_next soma o passo do modo (RadioMode 1000, MusicMode 1);
+- press_prev subtrai o passo se `playing` > 0, senao zera;
+- change_mode troca o modo e zera `playing`.
+
+O passo de cada modo e descoberto executando a classe original uma vez.
+"""
+from __future__ import annotations
+from typing import Iterable
+
+import numpy as np
+
+from state_2 import MusicMode, PlayMode, RadioMode, Sound
+
+PLAY_MODES: tuple[type[PlayMode], ...] = (RadioMode, MusicMode)
+
+# Codigos de evento: CHANGE_MODE + i muda para o modo i
+NEXT, PREV, CHANGE_MODE = range(3)
+
+
+def mode_step(mode: type[PlayMode]) -> int:
+    sound = Sound.__new__(Sound)
+    sound.playing = 0
+    mode(sound).press_next()
+    return sound.playing
+
+
+class SoundFleet:
+    def __init__(
+        self, size: int, modes: Iterable[type[PlayMode]] = PLAY_MODES
+    ) -> None:
+        self.modes_classes = tuple(modes)
+        self._steps = np.array(
+            [mode_step(mode) for mode in self.modes_classes], dtype=np.int64
+        )
+        # Todo Sound comeca no primeiro modo (RadioMode) tocando 0. O passo
+        # de cada aparelho fica em cache e so muda quando o modo muda
+        self.playing = np.zeros(size, dtype=np.int64)
+        self.modes = np.zeros(size, dtype=np.int8)
+        self._device_steps = np.full(size, self._steps[0], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.playing)
+
+    # Os eventos usam so aritmetica: mascaras booleanas aleatorias em
+    # indexacao ou em `where=` sao varias vezes mais lentas
+
+    def press_next(self) -> None:
+        self.playing += self._device_steps
+
+    def press_prev(self) -> None:
+        on = self.playing > 0
+        self.playing -= self._device_steps * on
+        self.playing *= on
+
+    def change_mode(self, mode: int) -> None:
+        self.modes[:] = mode
+        self._device_steps[:] = self._steps[mode]
+        self.playing[:] = 0
+
+    def apply(self, events: np.ndarray) -> None:
+        # Um evento por aparelho (NEXT, PREV ou CHANGE_MODE + modo)
+        events = np.asarray(events, dtype=np.int8)
+        playing = self.playing
+        prev = events == PREV
+        on = playing > 0
+
+        # +1 para NEXT, -1 para PREV com playing > 0; PREV com
+        # playing <= 0 zera
+        sign = (events == NEXT).view(np.int8) - (prev & on).view(np.int8)
+        playing += self._device_steps * sign
+        playing *= ~(prev & ~on)
+
+        change = events >= CHANGE_MODE
+        if change.any():
+            devices = np.flatnonzero(change)
+            modes = events[devices] - CHANGE_MODE
+            self.modes[devices] = modes
+            self._device_steps[devices] = self._steps[modes]
+            playing[devices] = 0
+
+    def mode_name(self, device: int) -> str:
+        return self.modes_classes[self.modes[device]].__name__
+
+
+def check_conformance(devices: int = 50, events: int = 200) -> None:
+    # Compara a frota com objetos Sound recebendo os mesmos eventos
+    import io
+    from contextlib import redirect_stdout
+
+    rng = np.random.default_rng(0)
+    fleet = SoundFleet(devices)
+    sounds = [Sound() for _ in range(devices)]
+    codes = rng.choice(
+        [NEXT, PREV, CHANGE_MODE, CHANGE_MODE + 1],
+        size=(events, devices), p=[0.45, 0.45, 0.05, 0.05],
+    )
+
+    with redirect_stdout(io.StringIO()):
+        for step in codes:
+            fleet.apply(step)
+            for sound, code in zip(sounds, step):
+                if code == NEXT:
+                    sound.press_next()
+                elif code == PREV:
+                    sound.press_prev()
+                else:
+                    mode = fleet.modes_classes[code - CHANGE_MODE]
+                    sound.change_mode(mode(sound))
+
+            assert fleet.playing.tolist() == [s.playing for s in sounds]
+            assert [fleet.mode_name(i) for i in range(devices)] == [
+                type(sound.mode).__name__ for sound in sounds
+            ]
+
+
+if __name__ == '__main__':
+    import io
+    from contextlib import redirect_stdout
+    from time import perf_counter
+
+    check_conformance()
+    print('Frota igual aos objetos Sound')
+
+    fleet = SoundFleet(3)
+    fleet.apply(np.array([NEXT, NEXT, CHANGE_MODE + 1]))
+    fleet.apply(np.array([NEXT, PREV, NEXT]))
+    fleet.apply(np.array([PREV, PREV, PREV]))
+    print(fleet.playing, [fleet.mode_name(i) for i in range(len(fleet))])
+
+    devices, events = 1_000_000, 1_000
+    fleet = SoundFleet(devices)
+    rng = np.random.default_rng(1)
+    # Poucos eventos distintos, reaproveitados, para nao medir o gerador
+    pool = rng.choice([NEXT, PREV, CHANGE_MODE, CHANGE_MODE + 1],
+                      size=(16, devices), p=[0.49, 0.49, 0.01, 0.01])
+    pool = pool.astype(np.int8)
+
+    start = perf_counter()
+    for event in range(events):
+        fleet.apply(pool[event % len(pool)])
+    elapsed = perf_counter() - start
+    print(f'{devices} aparelhos x {events} eventos: {elapsed:.2f} s '
+          f'({elapsed / devices / events * 1e9:.2f} ns/evento)')
+
+    start = perf_counter()
+    for event in range(events):
+        fleet.press_next()
+    elapsed = perf_counter() - start
+    print(f'press_next na frota inteira: {elapsed / events * 1e3:.2f} ms')
+
+    # Referencia: objetos Sound (prints descartados), em escala menor
+    sounds = [Sound() for _ in range(10_000)]
+    with redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        for _ in range(100):
+            for sound in sounds:
+                sound.press_next()
+        elapsed = perf_counter() - start
+    print(f'Objetos Sound: {elapsed / len(sounds) / 100 * 1e9:.0f} ns/evento')
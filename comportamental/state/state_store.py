@@ -0,0 +1,227 @@
+"""
+Armazenamento colunar em disco do estado dos pedidos.
+
+Pickle de milhoes de Order + OrderState e lento e ocupa muito espaco. Aqui
+o arquivo tem um cabecalho fixo e duas colunas de largura fixa:
+
+    | magic (8 bytes) | quantidade (uint64) |
+    | ids (int64 x n, em ordem crescente)   |
+    | estados (int8 x n)                    |
+
+Os ids ordenados sao o indice: a busca de um pedido e uma busca binaria
+na coluna mapeada em memoria. As colunas sao acessadas via np.memmap, sem
+carregar o arquivo; StoredOrder le e escreve o codigo do estado direto na
+linha do pedido. A carga e a gravacao em massa copiam colunas inteiras,
+sem criar objetos por pedido.
+"""
+from __future__ import annotations
+import os
+from typing import Literal
+
+import numpy as np
+
+from state_batch import OrderBatch
+from state_table import (APPROVE, DEFAULT_MACHINE, PENDING, REJECT,
+                         OrderMachine, TableState)
+
+MAGIC = b'ORDSTATE'
+HEADER = np.dtype([('magic', 'S8'), ('count', '<u8')])
+
+
+class StoredOrder:
+    # Contexto preguicoso: so guarda a linha do pedido no store
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: OrderStore, row: int) -> None:
+        self.store = store
+        self.row = row
+
+    # Dois StoredOrder da mesma linha sao o mesmo pedido (usado pelas
+    # listras de ConcurrentOrderMachine)
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, StoredOrder)
+            and other.store is self.store and other.row == self.row
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.row))
+
+    @property
+    def machine(self) -> OrderMachine:
+        return self.store.machine
+
+    @property
+    def order_id(self) -> int:
+        return int(self.store.ids[self.row])
+
+    @property
+    def state(self) -> TableState:
+        return self.store.machine.states[self.store.states[self.row]]
+
+    @state.setter
+    def state(self, state: TableState) -> None:
+        self.store.states[self.row] = state.code
+
+    def pending(self) -> bool:
+        return self.machine.fire(self, PENDING)  # type: ignore[arg-type]
+
+    def approve(self) -> bool:
+        return self.machine.fire(self, APPROVE)  # type: ignore[arg-type]
+
+    def reject(self) -> bool:
+        return self.machine.fire(self, REJECT)  # type: ignore[arg-type]
+
+
+class OrderStore:
+    def __init__(
+        self,
+        path: str,
+        writable: bool = False,
+        machine: OrderMachine = DEFAULT_MACHINE,
+    ) -> None:
+        self.path = path
+        self.machine = machine
+        header = np.fromfile(path, dtype=HEADER, count=1)
+
+        if len(header) != 1 or header['magic'][0] != MAGIC:
+            raise ValueError(f'{path} nao e um arquivo de pedidos')
+
+        count = int(header['count'][0])
+        mode: Literal['r', 'r+'] = 'r+' if writable else 'r'
+        offset = HEADER.itemsize
+        self.ids: np.ndarray
+        self.states: np.ndarray
+        # np.memmap nao aceita arquivos com shape 0
+        if count:
+            self.ids = np.memmap(path, dtype='<i8', mode=mode,
+                                 offset=offset, shape=count)
+            self.states = np.memmap(path, dtype=np.int8, mode=mode,
+                                    offset=offset + 8 * count, shape=count)
+        else:
+            self.ids = np.empty(0, dtype='<i8')
+            self.states = np.empty(0, dtype=np.int8)
+
+    @staticmethod
+    def save(
+        path: str, ids: np.ndarray, states: np.ndarray | None = None
+    ) -> None:
+        ids = np.asarray(ids, dtype='<i8')
+        if states is None:
+            states = np.zeros(len(ids), dtype=np.int8)
+        states = np.asarray(states, dtype=np.int8)
+
+        if len(ids) != len(states):
+            raise ValueError('ids e estados com tamanhos diferentes')
+
+        # Ids ja ordenados (como os de um store) sao gravados sem ordenar
+        if len(ids) > 1 and not np.all(ids[1:] > ids[:-1]):
+            order = np.argsort(ids)
+            ids, states = ids[order], states[order]
+            if not np.all(ids[1:] > ids[:-1]):
+                raise ValueError('ids de pedido repetidos')
+
+        header = np.array([(MAGIC, len(ids))], dtype=HEADER)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as file:
+            header.tofile(file)
+            ids.tofile(file)
+            states.tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def save_batch(cls, path: str, ids: np.ndarray, batch: OrderBatch) -> None:
+        cls.save(path, ids, batch.states)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _find(self, order_id: int) -> int:
+        row = int(np.searchsorted(self.ids, order_id))
+        if row < len(self.ids) and self.ids[row] == order_id:
+            return row
+        return -1
+
+    def __contains__(self, order_id: int) -> bool:
+        return self._find(order_id) >= 0
+
+    def rows(self, order_ids: np.ndarray) -> np.ndarray:
+        # Linhas de varios pedidos de uma vez; KeyError se algum nao existe
+        order_ids = np.asarray(order_ids, dtype='<i8')
+        rows = np.searchsorted(self.ids, order_ids)
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == order_ids[found]
+
+        if not found.all():
+            raise KeyError(int(order_ids[~found][0]))
+        return rows
+
+    def get(self, order_id: int) -> StoredOrder:
+        row = self._find(order_id)
+        if row < 0:
+            raise KeyError(order_id)
+        return StoredOrder(self, row)
+
+    def load_batch(self) -> OrderBatch:
+        batch = OrderBatch(0, self.machine)
+        batch.states = np.array(self.states)
+        return batch
+
+    def write_batch(self, batch: OrderBatch) -> None:
+        # Grava no lugar os estados de um lote lido com load_batch()
+        if len(batch) != len(self):
+            raise ValueError('Lote com tamanho diferente do store')
+        self.states[:] = batch.states
+
+    def flush(self) -> None:
+        if isinstance(self.states, np.memmap):
+            self.states.flush()
+
+    def close(self) -> None:
+        self.flush()
+        del self.ids, self.states
+
+
+if __name__ == '__main__':
+    import tempfile
+    from time import perf_counter
+
+    from state_table import EVENTS
+
+    size = 10_000_000
+    rng = np.random.default_rng(0)
+    ids = np.sort(rng.permutation(size * 4)[:size]).astype('<i8')
+    batch = OrderBatch(size)
+    batch.apply(rng.integers(0, len(EVENTS), size, dtype=np.int8))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.bin')
+
+        start = perf_counter()
+        OrderStore.save_batch(path, ids, batch)
+        save_time = perf_counter() - start
+        size_mib = os.path.getsize(path) / 2**20
+
+        start = perf_counter()
+        store = OrderStore(path, writable=True)
+        loaded = store.load_batch()
+        load_time = perf_counter() - start
+
+        print(f'{size} pedidos: {size_mib:.1f} MiB, '
+              f'gravacao {save_time:.3f} s, carga {load_time:.3f} s')
+        assert np.array_equal(loaded.states, batch.states)
+
+        # Um pedido pendente, acessado sem carregar o resto do store
+        order_id = int(ids[np.argmax(batch.states == 0)])
+        order = store.get(order_id)
+        print(order_id, order.state, end=' ')
+        order.approve()
+        print('->', order.state)
+        store.close()
+
+        store = OrderStore(path)
+        print('Depois de reabrir:', store.get(order_id).state)
+        print(-1 in store, store.rows(ids[:3]))
+        store.close()
@@ -0,0 +1,205 @@
+"""
+Maquina de estados do Order compilada em uma tabela de transicoes.
+
+No state.py cada transicao cria um novo objeto de estado e imprime uma
+mensagem. Aqui os estados nao guardam dados (o pedido e passado como
+argumento), entao existe uma unica instancia de cada estado, compartilhada
+por todos os pedidos. A transicao e uma busca O(1) na tabela
+(estado, evento) -> (proximo estado, mensagem).
+
+A tabela e compilada a partir das classes originais: cada estado e
+executado uma vez para cada evento, e o estado resultante e a mensagem
+impressa sao registrados. No lugar dos prints, a maquina chama os hooks
+registrados.
+"""
+from __future__ import annotations
+import io
+from contextlib import redirect_stdout
+from typing import Callable, Iterable
+
+from state import (Order, OrderState, PaymentApproved, PaymentPending,
+                   PaymentRejected)
+
+EVENTS = ('pending', 'approve', 'reject')
+PENDING, APPROVE, REJECT = range(len(EVENTS))
+
+ORDER_STATES: tuple[type[OrderState], ...] = (
+    PaymentPending, PaymentApproved, PaymentRejected,
+)
+
+
+class TableState:
+    # Estado sem dados: uma instancia compartilhada por todos os pedidos
+    __slots__ = ('code', 'name')
+
+    def __init__(self, code: int, name: str) -> None:
+        self.code = code
+        self.name = name
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __repr__(self) -> str:
+        return f'<{self.name}>'
+
+
+Transition = tuple[TableState, str]
+Hook = Callable[['TableOrder', str, TableState, TableState, str], None]
+
+
+def compile_table(
+    state_classes: Iterable[type[OrderState]] = ORDER_STATES,
+) -> tuple[tuple[TableState, ...], list[list[Transition]]]:
+    classes = list(state_classes)
+    states = tuple(
+        TableState(code, cls.__name__) for code, cls in enumerate(classes)
+    )
+    by_class = dict(zip(classes, states))
+    table: list[list[Transition]] = []
+
+    for cls, state in by_class.items():
+        row = []
+        for event in EVENTS:
+            # Pedido de sonda: sem passar pelo __init__ e pelos prints
+            order = Order.__new__(Order)
+            order.state = cls(order)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                getattr(order.state, event)()
+
+            target = type(order.state)
+            if target not in by_class:
+                raise LookupError(
+                    f'{cls.__name__}.{event}() levou a um estado '
+                    f'desconhecido: {target.__name__}'
+                )
+            row.append((by_class[target], output.getvalue().strip()))
+        table.append(row)
+
+    return states, table
+
+
+class OrderMachine:
+    def __init__(
+        self, state_classes: Iterable[type[OrderState]] = ORDER_STATES
+    ) -> None:
+        self.states, self._table = compile_table(state_classes)
+        self.initial = self.states[0]
+        self.hooks: list[Hook] = []
+
+    def add_hook(self, hook: Hook) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        self.hooks.remove(hook)
+
+    def next_state(self, state: TableState, event: int) -> TableState:
+        return self._table[state.code][event][0]
+
+    def fire(self, order: TableOrder, event: int) -> bool:
+        # Retorna se o estado mudou
+        old = order.state
+        new, message = self._table[old.code][event]
+        order.state = new
+
+        for hook in self.hooks:
+            hook(order, EVENTS[event], old, new, message)
+
+        return new is not old
+
+
+DEFAULT_MACHINE = OrderMachine()
+
+
+class TableOrder:
+    # Contexto
+    __slots__ = ('state', 'machine')
+
+    def __init__(self, machine: OrderMachine = DEFAULT_MACHINE) -> None:
+        self.machine = machine
+        self.state: TableState = machine.initial
+
+    def pending(self) -> bool:
+        return self.machine.fire(self, PENDING)
+
+    def approve(self) -> bool:
+        return self.machine.fire(self, APPROVE)
+
+    def reject(self) -> bool:
+        return self.machine.fire(self, REJECT)
+
+
+def check_conformance(max_length: int = 6) -> int:
+    # Compara com as classes originais todas as sequencias de eventos ate
+    # `max_length`, estado a estado e mensagem a mensagem
+    from itertools import product
+
+    machine = OrderMachine()
+    messages: list[str] = []
+    machine.add_hook(lambda order, event, old, new, message:
+                     messages.append(message))
+    checked = 0
+
+    for length in range(1, max_length + 1):
+        for events in product(EVENTS, repeat=length):
+            with redirect_stdout(io.StringIO()):
+                order = Order()
+            table_order = TableOrder(machine)
+
+            for event in events:
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    getattr(order.state, event)()
+                getattr(table_order, event)()
+
+                expected = (str(order.state), output.getvalue().strip())
+                got = (str(table_order.state), messages.pop())
+                assert got == expected, (events, got, expected)
+            checked += 1
+
+    return checked
+
+
+if __name__ == '__main__':
+    from time import perf_counter
+
+    print('Sequencias conferidas:', check_conformance())
+    print()
+
+    def log(order, event, old, new, message):
+        print(f'{event}: {old} -> {new} ({message})')
+
+    machine = OrderMachine()
+    machine.add_hook(log)
+    order = TableOrder(machine)
+    order.pending()
+    order.approve()
+    order.approve()
+    order.pending()
+    order.approve()
+    order.reject()
+    order.pending()
+    order.approve()
+    order.reject()
+    print()
+
+    n = 200_000
+    with redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        for _ in range(n // 3):
+            classic = Order()
+            classic.approve()
+            classic.pending()
+            classic.reject()
+        classic_time = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(n // 3):
+        fast = TableOrder()
+        fast.approve()
+        fast.pending()
+        fast.reject()
+    table_time = perf_counter() - start
+
+    print(f'Classes originais: {classic_time / n * 1e9:7.0f} ns/transicao')
+    print(f'Tabela:            {table_time / n * 1e9:7.0f} ns/transicao')
@@ -8,7 +8,9 @@ usado.
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
+
+_MISSING = object()
 
 
 class IObservable(ABC):
@@ -25,7 +27,8 @@ class IObservable(ABC):
     def remove_observer(self, observer: IObserver) -> None: pass
 
     @abstractmethod
-    def notify_observers(self) -> None: pass
+    def notify_observers(self, changed: Optional[Set[str]] = None) -> None:
+        pass
 
 
 class WeatherStation(IObservable):
@@ -37,15 +40,26 @@ class WeatherStation(IObservable):
 
     @property
     def state(self) -> Dict:
+        # O dict vivo do estado: ele muda nas proximas atualizacoes. Quem
+        # precisa de uma foto do estado deve copia-lo (dict(state)).
         return self._state
 
     @state.setter
     def state(self, state_update: Dict) -> None:
-        new_state: Dict = {**self._state, **state_update}
+        # Compara so as chaves recebidas; se nada mudou, nada e alocado
+        current = self._state
+        changed: Optional[Set[str]] = None
+
+        for key, value in state_update.items():
+            if current.get(key, _MISSING) != value:
+                if changed is None:
+                    changed = set()
+                changed.add(key)
+                # Escreve ja no loop para manter a ordem das chaves novas
+                current[key] = value
 
-        if new_state != self._state:
-            self._state = new_state
-            self.notify_observers()
+        if changed is not None:
+            self.notify_observers(changed)
 
     def reset_state(self) -> None:
         self._state = {}
@@ -60,7 +74,8 @@ class WeatherStation(IObservable):
 
         self._observers.remove(observer)
 
-    def notify_observers(self) -> None:
+    def notify_observers(self, changed: Optional[Set[str]] = None) -> None:
+        """ `changed` sao as chaves alteradas (None: o estado todo) """
         for observer in self._observers:
             observer.update()
         print()